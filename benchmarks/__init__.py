@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Performance benchmarks for pointilist.
+"""
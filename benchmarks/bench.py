@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Times the stages of pointilist on synthetic graphs and compares
+    the results against a stored baseline.
+
+    Run with 'make bench'. After intended performance changes, store
+    new reference numbers with 'python -m benchmarks.bench
+    --update-baseline'.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from pointilist.graph import Graph
+from pointilist.repo import Repo
+
+from benchmarks.synthetic import generate_svg
+
+CALIBRATION = 'calibration'
+BASELINE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        'baseline.json')
+
+# minimum time each round of a stage is timed for, in seconds
+MIN_TIME = 0.05
+
+# complete runs a new baseline is the median of, so that it does not
+# depend on how fast the machine happened to be during a single run
+BASELINE_RUNS = 3
+
+# seconds allowed regardless of the baseline and calibration; the
+# interpreter start dominates these and does not scale with the
+# reference workload
+BUDGETS = {
+    'cli/startup': 0.5
+}
+
+SCENARIOS = [
+    # name, years, density
+    ('1y', 1, 0.5),
+    ('5y', 5, 0.5)
+]
+
+
+def _parsed(svg):
+    graph = Graph('bench')
+    graph._parse_graph_data(svg)
+    return graph
+
+
+def _filled(svg):
+    graph = _parsed(svg)
+    graph.fill(seed=0)
+    return graph
+
+
+def _populate(graph, tempdir):
+    with Repo(graph.commits(), tempdir=tempdir) as repo:
+        repo.populate()
+
+
+def _populate_in_memory(graph):
+    with Repo(graph.commits(), in_memory=True) as repo:
+        repo.populate()
+
+
+def stages(svg, tempdir):
+    """Returns (name, setup, run, unit) for every benchmarked stage.
+
+    setup() prepares the input outside of the timed region, run(arg)
+    is timed and unit(arg) returns the number of items processed. run
+    has to give the same result when called repeatedly on one arg.
+    """
+
+    def rects(_):
+        return len(_parsed(svg).data['rects'])
+
+    def commits(graph):
+        return sum(graph.data['commits'].counts)
+
+    return [
+        ('validate', lambda: None,
+         lambda _: Graph._graph_data_valid(svg), rects),
+        ('parse', lambda: None, lambda _: _parsed(svg), rects),
+        ('colormap', lambda: _parsed(svg),
+         lambda g: g._create_colormap(), lambda g: len(g.data['rects'])),
+        ('fill', lambda: _parsed(svg),
+         lambda g: g.fill(seed=0), lambda g: len(g.data['rects'])),
+        ('populate', lambda: _filled(svg),
+         lambda g: _populate(g, tempdir), commits),
+        ('populate_memory', lambda: _filled(svg),
+         _populate_in_memory, commits)
+    ]
+
+
+def _startup():
+    subprocess.run(
+        [sys.executable, '-m', 'pointilist', '--help'],
+        stdout=subprocess.DEVNULL, check=True
+    )
+
+
+def _time_round(setup, run, min_time):
+    """Returns the time per call of run, calling it until at least
+    min_time was spent in it.
+    """
+
+    total = 0.0
+    calls = 0
+    arg = setup()
+    gc.collect()
+    gc.disable()
+    try:
+        while calls == 0 or total < min_time:
+            start = time.perf_counter()
+            run(arg)
+            total += time.perf_counter() - start
+            calls += 1
+    finally:
+        gc.enable()
+    return total / calls
+
+
+def measure(setup, run, unit, repeat, min_time=MIN_TIME):
+    """Returns time, throughput and peak memory of a stage.
+
+    Every one of repeat rounds calls the stage until at least min_time
+    seconds were spent in it, so that short stages are not timed from
+    a single call. The median time per call counts, like the median
+    of the calibration.
+    """
+
+    seconds = statistics.median(
+        _time_round(setup, run, min_time) for _ in range(repeat)
+    )
+
+    arg = setup()
+    tracemalloc.start()
+    run(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'seconds': seconds,
+        'per_second': unit(arg) / seconds if seconds else 0.0,
+        'peak_bytes': peak
+    }
+
+
+def _reference_workload():
+    data = '<r>' + '<e a="1">t</e>' * 20000 + '</r>'
+    for _ in range(2):
+        for elem in ET.fromstring(data).iter('e'):
+            int(elem.get('a'))
+
+
+def calibrate(samples, repeat=2):
+    """Times a fixed reference workload on the current machine.
+
+    Appends the times of repeat runs to samples. Timings are compared
+    relative to their median, so that the gate tolerates running on a
+    faster or slower machine than the one the baseline was recorded on.
+    """
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _reference_workload()
+        samples.append(time.perf_counter() - start)
+
+
+def run_benchmarks(repeat, tempdir=None, min_time=MIN_TIME, only=None):
+    """Runs all scenarios and returns {'scenario/stage': result}.
+
+    The machine is calibrated once per run, from samples spread over
+    the whole run, and the same calibration is stored with every
+    result. If only is given, just the benchmarks named in it are run.
+    """
+
+    samples = []
+    results = {}
+    for name, years, density in SCENARIOS:
+        svg = generate_svg(years=years, density=density)
+        for stage, setup, run, unit in stages(svg, tempdir):
+            key = '{}/{}'.format(name, stage)
+            if only is not None and key not in only:
+                continue
+            calibrate(samples)
+            results[key] = measure(setup, run, unit, repeat, min_time)
+
+    if only is None or 'cli/startup' in only:
+        # cold start of the command line tool in a fresh interpreter
+        results['cli/startup'] = measure(
+            lambda: None, lambda _: _startup(), lambda _: 1, repeat,
+            min_time
+        )
+    calibrate(samples)
+
+    calibration = statistics.median(samples)
+    for result in results.values():
+        result[CALIBRATION] = calibration
+    return results
+
+
+def merge(runs):
+    """Returns the median of every metric of several runs' results."""
+
+    return {
+        key: {
+            metric: statistics.median(run[key][metric] for run in runs)
+            for metric in result
+        } for key, result in runs[0].items()
+    }
+
+
+def _scale(key, result, baseline):
+    """Returns the ratio of the calibration times of both results."""
+
+    if key in BUDGETS:
+        return 1.0
+    if CALIBRATION in result and CALIBRATION in baseline:
+        return result[CALIBRATION] / baseline[CALIBRATION]
+    return 1.0
+
+
+def compare(results, baseline, tolerance):
+    """Returns a list of regressions against baseline.
+
+    Baseline times are scaled to the speed of the current machine,
+    except for benchmarks with a fixed budget in BUDGETS.
+    """
+
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        scale = _scale(key, result, baseline[key])
+        for metric in ['seconds', 'peak_bytes']:
+            limit = baseline[key][metric] * (1 + tolerance)
+            if metric == 'seconds':
+                limit = BUDGETS.get(key, limit * scale)
+            if result[metric] > limit:
+                regressions.append(
+                    '{} {}: {:.6g} > {:.6g} (baseline {:.6g})'.format(
+                        key, metric, result[metric], limit,
+                        baseline[key][metric]
+                    )
+                )
+    return regressions
+
+
+def report(results, baseline):
+    """Prints a table of results, relative to baseline if available."""
+
+    print('{:<22} {:>12} {:>14} {:>12} {:>8}'.format(
+        'benchmark', 'time [ms]', 'items/s', 'peak [kB]', 'vs base'
+    ))
+    for key, result in sorted(results.items()):
+        relative = ''
+        if key in baseline and baseline[key]['seconds']:
+            scale = _scale(key, result, baseline[key])
+            relative = '{:.2f}x'.format(
+                result['seconds'] / (baseline[key]['seconds'] * scale)
+            )
+        print('{:<22} {:>12.3f} {:>14.0f} {:>12.1f} {:>8}'.format(
+            key, result['seconds'] * 1000, result['per_second'],
+            result['peak_bytes'] / 1024, relative
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='timed rounds per stage; the median counts')
+    parser.add_argument('--min-time', type=float, default=MIN_TIME,
+                        help='seconds each round of a stage runs at least')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed slowdown/growth over the baseline')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file to compare against')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--confirm', type=int, default=2,
+                        help='runs of their own that slower stages get '
+                        'before they count as regressions')
+    parser.add_argument('--runs', type=int,
+                        help='complete runs whose median counts; by default '
+                        '{} when updating the baseline and 1 otherwise'.format(
+                            BASELINE_RUNS
+                        ))
+    args = parser.parse_args(argv)
+    if args.runs is None:
+        args.runs = BASELINE_RUNS if args.update_baseline else 1
+
+    tempdir = os.environ.get('POINTILIST_TEST_BASEDIR')
+    results = merge([
+        run_benchmarks(args.repeat, tempdir, args.min_time)
+        for _ in range(args.runs)
+    ])
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        report(results, baseline)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print('Baseline written to {}.'.format(args.baseline))
+        return 0
+
+    # a stage is only slower if it stays slower in runs of its own
+    for _ in range(args.confirm):
+        failed = {
+            key for key, result in results.items()
+            if compare({key: result}, baseline, args.tolerance)
+        }
+        if not failed:
+            break
+        print('Measuring {} again.'.format(', '.join(sorted(failed))),
+              file=sys.stderr)
+        results.update(run_benchmarks(
+            args.repeat, tempdir, args.min_time, only=failed
+        ))
+
+    report(results, baseline)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print('\nPERFORMANCE REGRESSION (tolerance {:.0%}):'.format(
+            args.tolerance
+        ), file=sys.stderr)
+        for regression in regressions:
+            print('  ' + regression, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
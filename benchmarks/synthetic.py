@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Generates synthetic contribution graph SVGs.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import datetime
+import random
+
+from pointilist.graph import FILL_DEFAULT
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+WDAYS = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+
+
+def _fill(count, max_count):
+    if count == 0:
+        return FILL_DEFAULT[0]
+    for idx, divisor in [(1, 6), (2, 3), (3, 2)]:
+        if count <= max_count // divisor:
+            return FILL_DEFAULT[idx]
+    return FILL_DEFAULT[4]
+
+
+def generate_svg(years=1, density=0.5, max_count=10, seed=0,
+                 end=datetime.date(2018, 5, 30)):
+    """Returns a contribution graph SVG covering years years up to end.
+
+    Every day has contributions with probability density, with counts
+    uniformly distributed between 1 and max_count. The layout mimics
+    the graph served by github: one group of seven rects per week,
+    followed by the month and weekday labels.
+    """
+
+    rng = random.Random(seed)
+    start = end - datetime.timedelta(days=365 * years - 1)
+    # weeks start on Sunday
+    start -= datetime.timedelta(days=(start.weekday() + 1) % 7)
+
+    days = []
+    day = start
+    while day <= end:
+        count = rng.randint(1, max_count) if rng.random() < density else 0
+        days.append((day, count))
+        day += datetime.timedelta(days=1)
+    top = max(count for _, count in days)
+
+    lines = [
+        '<svg width="{}" height="104" class="js-calendar-graph-svg">'.format(
+            13 * (len(days) // 7 + 1) + 16
+        ),
+        '  <g transform="translate(16, 20)">'
+    ]
+    months = []
+    for week in range(0, len(days), 7):
+        w = week // 7
+        lines.append(
+            '      <g transform="translate({}, 0)">'.format(13 * w)
+        )
+        for day, count in days[week:week + 7]:
+            wday = (day.weekday() + 1) % 7
+            lines.append(
+                '          <rect class="day" width="10" height="10" '
+                'x="{}" y="{}" fill="{}" data-count="{}" '
+                'data-date="{}"/>'.format(
+                    13 - w, 12 * wday, _fill(count, top), count,
+                    day.isoformat()
+                )
+            )
+            if day.day == 1:
+                months.append((13 * w, MONTHS[day.month - 1]))
+        lines.append('      </g>')
+
+    for x, month in months:
+        lines.append(
+            '      <text x="{}" y="-10" class="month">{}</text>'.format(
+                x, month
+            )
+        )
+    for i, wday in enumerate(WDAYS):
+        style = '' if i % 2 else ' style="display: none;"'
+        lines.append(
+            '    <text text-anchor="start" class="wday" dx="-14" '
+            'dy="{}"{}>{}</text>'.format(8 + 12 * i, style, wday)
+        )
+    lines += ['  </g>', '</svg>', '']
+
+    return '\n'.join(lines)
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Allows running pointilist as 'python -m pointilist'.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import sys
+
+from pointilist.cli import main
+
+sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Minimal asyncio HTTP/1.1 client for retrieving contribution graphs.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import asyncio
+import ssl
+import urllib.parse
+from urllib.error import HTTPError
+
+MAX_REDIRECTS = 5
+USER_AGENT = 'pointilist'
+
+
+class Response:
+    """Response whose body is read incrementally with read()."""
+
+    def __init__(self, url, status, reason, headers, reader, writer,
+                 timeout=None):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self._reader = reader
+        self._writer = writer
+        self._timeout = timeout
+        self._chunked = headers.get('transfer-encoding', '').lower() \
+            == 'chunked'
+        length = headers.get('content-length')
+        self._remaining = int(length) if length is not None else None
+        if self._chunked:
+            self._remaining = 0
+        self._eof = status in (204, 304) or (
+            not self._chunked and self._remaining == 0
+        )
+
+    async def _read(self, coro):
+        return await asyncio.wait_for(coro, self._timeout)
+
+    async def _next_chunk_size(self):
+        line = await self._read(self._reader.readline())
+        size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+        if size == 0:
+            # skip trailers
+            while (await self._read(self._reader.readline())).strip():
+                pass
+        return size
+
+    async def read(self, size=65536):
+        """Returns up to size bytes of the body, or b'' at its end."""
+
+        if self._eof:
+            return b''
+
+        if self._chunked and self._remaining == 0:
+            self._remaining = await self._next_chunk_size()
+            if self._remaining == 0:
+                self._eof = True
+                return b''
+
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        data = await self._read(self._reader.read(size))
+        if not data:
+            if self._remaining:
+                raise ConnectionError('Connection closed before end of body')
+            self._eof = True
+            return b''
+
+        if self._remaining is not None:
+            self._remaining -= len(data)
+            if self._chunked and self._remaining == 0:
+                # CRLF after the chunk data
+                await self._read(self._reader.readexactly(2))
+            elif not self._chunked and self._remaining == 0:
+                self._eof = True
+        return data
+
+    async def read_all(self):
+        """Returns the remaining body."""
+
+        chunks = []
+        while True:
+            chunk = await self.read()
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def close(self):
+        """Closes the connection."""
+
+        self._writer.close()
+
+
+async def _request(url, headers, timeout):
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise ValueError('Unsupported URL scheme: {}'.format(parts.scheme))
+    https = parts.scheme == 'https'
+    port = parts.port or (443 if https else 80)
+    context = ssl.create_default_context() if https else None
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parts.hostname, port, ssl=context), timeout
+    )
+    try:
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        lines = [
+            'GET {} HTTP/1.1'.format(path),
+            'Host: {}'.format(parts.netloc),
+            'User-Agent: {}'.format(USER_AGENT),
+            'Accept-Encoding: identity',
+            'Connection: close'
+        ]
+        lines += ['{}: {}'.format(k, v) for k, v in (headers or {}).items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        fields = status_line.decode('latin-1').split(' ', 2)
+        try:
+            status = int(fields[1])
+            reason = fields[2] if len(fields) > 2 else ''
+        except (IndexError, ValueError):
+            raise ConnectionError(
+                'Invalid status line: {!r}'.format(status_line)
+            )
+
+        response_headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line.strip():
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+    except BaseException:
+        writer.close()
+        raise
+
+    return Response(
+        url, status, reason.strip(), response_headers, reader, writer,
+        timeout
+    )
+
+
+async def get(url, headers=None, timeout=None):
+    """Sends a GET request and returns the Response.
+
+    Redirects are followed. Like urllib, raises HTTPError for error
+    responses; the status of the returned response is below 400.
+    """
+
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await _request(url, headers, timeout)
+        location = response.headers.get('location')
+        if response.status in (301, 302, 303, 307, 308) and location:
+            response.close()
+            url = urllib.parse.urljoin(url, location)
+            continue
+        if response.status >= 400:
+            response.close()
+            raise HTTPError(
+                url, response.status, response.reason, response.headers,
+                None
+            )
+        return response
+
+    raise HTTPError(url, response.status, 'Too many redirects',
+                    response.headers, None)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Processes the contribution graphs of many accounts in parallel.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import concurrent.futures
+import os
+import random
+import shutil
+import tempfile
+
+from pointilist.futures import as_completed
+from pointilist.graph import GITHUB_URL, RANDOM_BIAS, Graph
+from pointilist.repo import DEFAULT_BRANCH, Repo
+from pointilist.store import DiskObjectStore
+
+# batch directory, scratch directory and object cache of the current
+# worker process, set up by its first job of a batch
+_root = None
+_scratch = None
+_object_cache = None
+
+
+def _init_worker(root, object_cache=None):
+    global _root, _scratch, _object_cache
+    if root == _root:
+        return
+    _root = root
+    _scratch = tempfile.mkdtemp(prefix='worker-', dir=root)
+    _object_cache = object_cache
+
+
+def _run_worker_job(root, object_cache, job, *args):
+    # ProcessPoolExecutor only accepts an initializer from Python 3.7
+    _init_worker(root, object_cache)
+    return run_job(job, *args)
+
+
+def _job_seed(seed, username):
+    if seed is None:
+        return None
+    return random.Random('{}:{}'.format(seed, username))
+
+
+def _branch_head(path):
+    head = DiskObjectStore(path).ref('refs/heads/' + DEFAULT_BRANCH)
+    return head.hex() if head is not None else None
+
+
+def error_report(username, exc):
+    """Returns the report of a job that failed with exc."""
+
+    return {
+        'username': username,
+        'commits': 0,
+        'head': None,
+        'cached': False,
+        'error': '{}: {}'.format(type(exc).__name__, exc)
+    }
+
+
+def run_job(job, seed=None, output_dir=None, base_url=GITHUB_URL,
+            plans=None, object_cache=None, tempdir=None):
+    """Runs fetch, fill and populate for a single account.
+
+    job is either a username or a Graph that already holds data, in
+    which case nothing is fetched. If output_dir is given, the
+    repository is kept in output_dir/<username>.git and updated
+    incrementally on later runs; otherwise it is created in tempdir,
+    by default the worker's scratch directory, and discarded.
+
+    With a seed and a PlanCache as plans, the plan of a graph whose
+    fingerprint did not change is reused, and populate is skipped if
+    the repository is still at the head the plan was populated to.
+
+    object_cache is a pack.ObjectCache shared by the repositories of
+    all jobs; in worker processes of run_batch() it defaults to the
+    one of the batch.
+
+    Returns a report dict; errors are reported instead of raised. Its
+    commits are the number of commits actually added, 0 if populate
+    was skipped or there was nothing new.
+    """
+
+    username = job.username if isinstance(job, Graph) else job
+    report = {
+        'username': username,
+        'commits': 0,
+        'head': None,
+        'cached': False,
+        'error': None
+    }
+
+    try:
+        if isinstance(job, Graph):
+            graph = job
+        else:
+            graph = Graph(username)
+            graph.fetch(base_url)
+
+        key = entry = None
+        if plans is not None and seed is not None:
+            key = plans.key(
+                graph, '{}:{}'.format(seed, username), bias=RANDOM_BIAS
+            )
+            entry = plans.get(key)
+
+        if entry is not None:
+            commits = graph.data['commits'] = entry['commits']
+        else:
+            commits = graph.fill(_job_seed(seed, username))
+
+        path = None
+        if output_dir is not None:
+            path = os.path.join(output_dir, username + '.git')
+
+        if entry is not None and entry['head'] is not None \
+                and path is not None and os.path.isdir(path) \
+                and _branch_head(path) == entry['head']:
+            report['head'] = entry['head']
+            report['cached'] = True
+            return report
+
+        if object_cache is None:
+            object_cache = _object_cache
+        if tempdir is None:
+            tempdir = _scratch
+        with Repo(graph.commits(), tempdir=tempdir, path=path,
+                  object_cache=object_cache) as repo:
+            repo.populate()
+            report['commits'] = repo.written
+            if repo.head is not None:
+                report['head'] = repo.head.hex()
+
+        if key is not None:
+            plans.put(key, commits, report['head'])
+    except Exception as exc:  # pylint: disable=broad-except
+        report['error'] = '{}: {}'.format(type(exc).__name__, exc)
+
+    return report
+
+
+def run_batch(jobs, workers=None, seed=None, tempdir=None, output_dir=None,
+              base_url=GITHUB_URL, max_pending=None, plans=None,
+              object_cache=None):
+    """Runs run_job() for every job on a pool of worker processes.
+
+    Every worker gets its own scratch directory below a temporary
+    directory created in tempdir, which is removed once the batch is
+    done. At most max_pending jobs (by default twice the number of
+    workers) are queued at any time. Yields one report per job in the
+    order in which the jobs complete.
+
+    With a seed, the fill of every account is reproducible regardless
+    of which worker processes it; see run_job() for plans.
+
+    Every worker gets its own copy of object_cache, a pack.ObjectCache,
+    for all of its jobs. The copies share only its directory, if any.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    root = tempfile.mkdtemp(prefix='pointilist-', dir=tempdir)
+    tasks = (
+        (job, _run_worker_job, (
+            root, object_cache, job, seed, output_dir, base_url, plans
+        ))
+        for job in jobs
+    )
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            for job, future in as_completed(
+                    executor, lambda: next(tasks, None), max_pending):
+                exc = future.exception()
+                if exc is None:
+                    yield future.result()
+                else:
+                    yield error_report(getattr(job, 'username', job), exc)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
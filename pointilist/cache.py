@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    On-disk cache for contribution graph responses.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from urllib.error import HTTPError
+
+from pointilist import instrument
+from pointilist.graph import CHUNK_SIZE, GITHUB_URL
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = '.graph'
+PLAN_SUFFIX = '.plan'
+
+
+class _EntryCache:
+    """Directory of pickled cache entries, bounded in size.
+
+    The total size of the entries is bounded by max_size bytes; least
+    recently used entries are evicted first. Only files ending in
+    suffix are considered, so caches of different kinds can share a
+    directory.
+    """
+
+    suffix = None
+
+    def __init__(self, directory, max_size=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(
+            self.directory,
+            urllib.parse.quote(name, safe='') + self.suffix
+        )
+
+    def _load(self, name):
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        if entry.get('version') != CACHE_VERSION:
+            return None
+
+        # the modification time doubles as the last access time for LRU
+        os.utime(path)
+        return entry
+
+    def _store(self, name, entry):
+        entry['version'] = CACHE_VERSION
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(name))
+
+        self._evict()
+        return entry
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+class GraphCache(_EntryCache):
+    """Cache of contribution graph responses, keyed by username.
+
+    Every entry holds the response body as far as it was read, its
+    ETag and Last-Modified validators and the parsed graph data.
+    Reading stops at the end of the calendar, so the body of a full
+    HTML page is cut off there; it still parses to the same data.
+    Entries younger than ttl seconds are used without any request;
+    older ones are revalidated with a conditional request, and a 304
+    response reuses the parsed data without reading or parsing a body.
+
+    The total size of the cache directory is bounded by max_size bytes;
+    least recently used entries are evicted first.
+    """
+
+    suffix = CACHE_SUFFIX
+
+    def __init__(self, directory, ttl=3600, max_size=64 * 1024 * 1024):
+        super().__init__(directory, max_size)
+        self.ttl = ttl
+
+    def get(self, username):
+        """Returns the cache entry for username, or None."""
+
+        return self._load(username)
+
+    def put(self, username, body, headers, data, fetched=None):
+        """Stores a (possibly cut off) body and its data for username."""
+
+        return self._store(username, {
+            'fetched': time.time() if fetched is None else fetched,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'body': body,
+            'data': data
+        })
+
+    def touch(self, username, entry):
+        """Marks entry as freshly validated, e.g. after a 304 response."""
+
+        return self.put(
+            username, entry['body'], {
+                'ETag': entry['etag'],
+                'Last-Modified': entry['last_modified']
+            }, entry['data']
+        )
+
+    def fresh(self, entry):
+        """Returns True if entry may be used without revalidation."""
+
+        return time.time() - entry['fetched'] < self.ttl
+
+    @staticmethod
+    def validators(entry):
+        """Returns the headers for a conditional request for entry."""
+
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def fetch(self, graph, base_url=GITHUB_URL):
+        """Retrieves contribution data for graph through the cache.
+
+        Returns True if a new response body was downloaded and parsed,
+        and False if the cached data was reused.
+        """
+
+        entry = self.get(graph.username)
+        if entry is not None and self.fresh(entry):
+            graph.data = entry['data']
+            return False
+
+        req = urllib.request.Request(
+            graph.url(base_url), headers=self.validators(entry)
+        )
+        start = time.perf_counter()
+        try:
+            page = urllib.request.urlopen(req)
+        except HTTPError as exc:
+            if exc.code != 304 or entry is None:
+                raise
+            instrument.record('network', time.perf_counter() - start)
+            self.touch(graph.username, entry)
+            graph.data = entry['data']
+            return False
+
+        with page:
+            body = []
+            graph._load(
+                collect(
+                    iter(lambda: page.read(CHUNK_SIZE), page.read(0)), body
+                ),
+                time.perf_counter() - start
+            )
+        self.put(graph.username, join(body), page.headers, graph.data)
+        return True
+
+
+class PlanCache(_EntryCache):
+    """Cache of commit plans.
+
+    Plans are keyed by the fingerprint of the graph they were made for,
+    the seed and any other fill parameters, see key(). Every entry also
+    remembers the branch head the plan was populated to, so that an
+    unchanged plan need not be populated again.
+    """
+
+    suffix = PLAN_SUFFIX
+
+    @staticmethod
+    def key(graph, seed, **params):
+        """Returns the key of a plan for graph.
+
+        seed and params have to be serializable as JSON. Plans of
+        unseeded fills are not reproducible and cannot be cached.
+        """
+
+        if seed is None:
+            raise ValueError('Cannot cache plans without a seed')
+        return hashlib.sha256(json.dumps(
+            [graph.fingerprint, seed, params], sort_keys=True
+        ).encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the entry for key, or None."""
+
+        return self._load(key)
+
+    def put(self, key, commits, head=None):
+        """Stores a plan and the head it was populated to (hex)."""
+
+        return self._store(key, {'commits': commits, 'head': head})
+
+
+def collect(chunks, body):
+    """Passes chunks through while appending them to body."""
+
+    for chunk in chunks:
+        body.append(chunk)
+        yield chunk
+
+
+def join(body):
+    """Joins the chunks collected by collect()."""
+
+    return body[0][:0].join(body) if body else b''
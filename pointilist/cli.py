@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Command line interface of pointilist.
+
+    Every subcommand imports only the modules it needs, so that short
+    invocations, e.g. from cron jobs or hooks, start quickly: reading a
+    saved graph does not load the XML parser or the network stack, and
+    the git object code is only loaded by populate.
+
+    Graphs are exchanged between subcommands as JSON, commit plans as
+    lines of 'YYYY-MM-DD count'. A file name of '-' stands for standard
+    input or output.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import argparse
+import sys
+
+
+def _open(name, mode):
+    if name == '-':
+        return sys.stdout if 'w' in mode else sys.stdin
+    return open(name, mode)
+
+
+def _close(f):
+    if f not in (sys.stdin, sys.stdout):
+        f.close()
+
+
+def _options(args, *names):
+    """Returns the given options that were set on the command line.
+
+    Unset options are left out, so the defaults of the library apply
+    without importing it just to parse the command line.
+    """
+
+    return {
+        name: getattr(args, name) for name in names
+        if getattr(args, name) is not None
+    }
+
+
+def _fetch_graph(args):
+    from pointilist.graph import Graph
+
+    graph = Graph(args.username)
+    options = _options(args, 'base_url')
+    if args.cache is None:
+        graph.fetch(**options)
+    else:
+        from pointilist.cache import GraphCache
+
+        GraphCache(args.cache).fetch(graph, **options)
+    return graph
+
+
+def _dump_graph(graph, f):
+    import json
+
+    json.dump({
+        'username': graph.username,
+        'rects': list(graph.data['rects']),
+        'months': graph.data['months'],
+        'wdays': graph.data['wdays']
+    }, f)
+    f.write('\n')
+
+
+def _load_graph(f):
+    import json
+
+    from pointilist.graph import Graph
+    from pointilist.rects import RectArray
+
+    obj = json.load(f)
+    try:
+        graph = Graph(obj['username'])
+        graph.data = {
+            'rects': RectArray.from_dicts(obj['rects']),
+            'months': obj['months'],
+            'wdays': obj['wdays']
+        }
+    except (KeyError, TypeError) as exc:
+        raise ValueError('Invalid graph file: {}'.format(exc))
+    graph._create_colormap()
+    return graph
+
+
+def _dump_plan(graph, f):
+    from pointilist.rects import ordinal_to_date
+
+    for date, count in graph.commits():
+        f.write('{} {}\n'.format(ordinal_to_date(date), count))
+
+
+def _load_plan(f):
+    """Yields the (date, count) records of a plan file lazily."""
+
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            date, count = line.split()
+            yield date, int(count)
+        except ValueError:
+            raise ValueError(
+                'Invalid plan line {}: {!r}'.format(number, line)
+            )
+
+
+def cmd_fetch(args):
+    """Fetches a contribution graph and saves it as JSON."""
+
+    graph = _fetch_graph(args)
+    f = _open(args.output, 'w')
+    try:
+        _dump_graph(graph, f)
+    finally:
+        _close(f)
+    return 0
+
+
+def cmd_fill(args):
+    """Plans random commits for a graph saved by fetch."""
+
+    f = _open(args.graph, 'r')
+    try:
+        graph = _load_graph(f)
+    finally:
+        _close(f)
+
+    graph.fill(args.seed)
+    f = _open(args.output, 'w')
+    try:
+        _dump_plan(graph, f)
+    finally:
+        _close(f)
+    return 0
+
+
+def cmd_plan(args):
+    """Fetches a contribution graph and plans random commits for it."""
+
+    graph = _fetch_graph(args)
+    graph.fill(args.seed)
+    f = _open(args.output, 'w')
+    try:
+        _dump_plan(graph, f)
+    finally:
+        _close(f)
+    return 0
+
+
+def cmd_populate(args):
+    """Writes the commits of a plan into a bare repository."""
+
+    from pointilist.repo import Repo
+
+    f = _open(args.plan, 'r')
+    try:
+        with Repo(_load_plan(f), path=args.repo,
+                  **_options(args, 'author', 'branch')) as repo:
+            repo.populate()
+            if args.push is not None and repo.head is not None:
+                repo.push(args.push)
+    finally:
+        _close(f)
+
+    if repo.head is not None:
+        print(repo.head.hex())
+    return 0
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='pointilist',
+        description='Fills github contribution graphs.'
+    )
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    def network(sub):
+        sub.add_argument('username', help='github user name')
+        sub.add_argument('--base-url',
+                         help='server to fetch the graph from '
+                              '(default: https://github.com)')
+        sub.add_argument('--cache', metavar='DIR',
+                         help='cache responses in DIR')
+
+    def output(sub, what):
+        sub.add_argument('-o', '--output', default='-',
+                         help='file to write the {} to'.format(what))
+
+    def seed(sub):
+        sub.add_argument('--seed', type=int,
+                         help='seed for reproducible plans')
+
+    sub = commands.add_parser('fetch', help=cmd_fetch.__doc__)
+    network(sub)
+    output(sub, 'graph')
+    sub.set_defaults(func=cmd_fetch)
+
+    sub = commands.add_parser('fill', help=cmd_fill.__doc__)
+    sub.add_argument('graph', help='graph file written by fetch')
+    output(sub, 'plan')
+    seed(sub)
+    sub.set_defaults(func=cmd_fill)
+
+    sub = commands.add_parser('plan', help=cmd_plan.__doc__)
+    network(sub)
+    output(sub, 'plan')
+    seed(sub)
+    sub.set_defaults(func=cmd_plan)
+
+    sub = commands.add_parser('populate', help=cmd_populate.__doc__)
+    sub.add_argument('plan', help='plan file written by fill or plan')
+    sub.add_argument('repo', help='bare repository to create or update')
+    sub.add_argument('--author',
+                     help='author and committer of the commits')
+    sub.add_argument('--branch',
+                     help='branch to commit to (default: master)')
+    sub.add_argument('--push', metavar='URL',
+                     help='push the branch to the repository at URL')
+    sub.set_defaults(func=cmd_populate)
+
+    return parser
+
+
+def main(argv=None):
+    """Runs the command line tool and returns its exit status."""
+
+    args = _parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as exc:
+        print('pointilist: {}'.format(exc), file=sys.stderr)
+        return 1
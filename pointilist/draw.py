@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Rasterizes text, bitmaps and images for drawing on a contribution
+    graph with Graph.draw().
+
+    A raster is a tuple of columns, one per week, each holding a shade
+    between 0 and 4 for every day of the week from Sunday to Saturday.
+    A shade of None leaves the day as it is.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import functools
+
+GRID_ROWS = 7
+
+FONT = {
+    'A': ('.#.', '#.#', '###', '#.#', '#.#'),
+    'B': ('##.', '#.#', '##.', '#.#', '##.'),
+    'C': ('.##', '#..', '#..', '#..', '.##'),
+    'D': ('##.', '#.#', '#.#', '#.#', '##.'),
+    'E': ('###', '#..', '##.', '#..', '###'),
+    'F': ('###', '#..', '##.', '#..', '#..'),
+    'G': ('.##', '#..', '#.#', '#.#', '.##'),
+    'H': ('#.#', '#.#', '###', '#.#', '#.#'),
+    'I': ('###', '.#.', '.#.', '.#.', '###'),
+    'J': ('..#', '..#', '..#', '#.#', '.#.'),
+    'K': ('#.#', '#.#', '##.', '#.#', '#.#'),
+    'L': ('#..', '#..', '#..', '#..', '###'),
+    'M': ('#...#', '##.##', '#.#.#', '#...#', '#...#'),
+    'N': ('#..#', '##.#', '#.##', '#..#', '#..#'),
+    'O': ('.#.', '#.#', '#.#', '#.#', '.#.'),
+    'P': ('##.', '#.#', '##.', '#..', '#..'),
+    'Q': ('.#.', '#.#', '#.#', '##.', '.##'),
+    'R': ('##.', '#.#', '##.', '#.#', '#.#'),
+    'S': ('.##', '#..', '.#.', '..#', '##.'),
+    'T': ('###', '.#.', '.#.', '.#.', '.#.'),
+    'U': ('#.#', '#.#', '#.#', '#.#', '###'),
+    'V': ('#.#', '#.#', '#.#', '#.#', '.#.'),
+    'W': ('#...#', '#...#', '#.#.#', '##.##', '#...#'),
+    'X': ('#.#', '#.#', '.#.', '#.#', '#.#'),
+    'Y': ('#.#', '#.#', '.#.', '.#.', '.#.'),
+    'Z': ('###', '..#', '.#.', '#..', '###'),
+    '0': ('###', '#.#', '#.#', '#.#', '###'),
+    '1': ('.#.', '##.', '.#.', '.#.', '###'),
+    '2': ('##.', '..#', '.#.', '#..', '###'),
+    '3': ('##.', '..#', '.#.', '..#', '##.'),
+    '4': ('#.#', '#.#', '###', '..#', '..#'),
+    '5': ('###', '#..', '##.', '..#', '##.'),
+    '6': ('.##', '#..', '###', '#.#', '###'),
+    '7': ('###', '..#', '.#.', '.#.', '.#.'),
+    '8': ('###', '#.#', '###', '#.#', '###'),
+    '9': ('###', '#.#', '###', '..#', '##.'),
+    ' ': ('..', '..', '..', '..', '..'),
+    '!': ('#', '#', '#', '.', '#'),
+    '?': ('##.', '..#', '.#.', '...', '.#.'),
+    '.': ('.', '.', '.', '.', '#'),
+    ',': ('..', '..', '..', '.#', '#.'),
+    ':': ('.', '#', '.', '#', '.'),
+    "'": ('#', '#', '.', '.', '.'),
+    '-': ('...', '...', '###', '...', '...'),
+    '+': ('...', '.#.', '###', '.#.', '...'),
+    '=': ('...', '###', '...', '###', '...'),
+    '_': ('...', '...', '...', '...', '###'),
+    '/': ('..#', '..#', '.#.', '#..', '#..'),
+    '(': ('.#', '#.', '#.', '#.', '.#'),
+    ')': ('#.', '.#', '.#', '.#', '#.')
+}
+
+# characters of bitmap() rows
+PIXELS = {'.': 0, '#': 4, ' ': None, '0': 0, '1': 1, '2': 2, '3': 3, '4': 4}
+
+
+def _columns(rows, pad=None):
+    """Transposes rows of shades into a raster, centered vertically.
+
+    Rows above and below are filled with pad.
+    """
+
+    if len(rows) > GRID_ROWS:
+        raise ValueError(
+            'Raster too high: {} > {} rows'.format(len(rows), GRID_ROWS)
+        )
+    width = max((len(row) for row in rows), default=0)
+    top = (GRID_ROWS - len(rows)) // 2
+    bottom = GRID_ROWS - len(rows) - top
+    rows = [list(row) + [None] * (width - len(row)) for row in rows]
+    return tuple(
+        tuple([pad] * top + [row[col] for row in rows] + [pad] * bottom)
+        for col in range(width)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def glyph(char, shade=4):
+    """Returns the raster of a single character of FONT."""
+
+    try:
+        rows = FONT[char]
+    except KeyError:
+        raise ValueError('No glyph for {!r}'.format(char))
+    return _columns([
+        [shade if pixel == '#' else 0 for pixel in row] for row in rows
+    ], 0)
+
+
+@functools.lru_cache(maxsize=256)
+def text(message, shade=4, spacing=1):
+    """Returns the raster of a message, set in FONT.
+
+    Letters are converted to upper case. Glyphs are rasterized only
+    once, and whole messages are cached as well, so rendering the same
+    banner again is a single lookup.
+    """
+
+    gap = ((0,) * GRID_ROWS,) * spacing
+    columns = []
+    for idx, char in enumerate(message.upper()):
+        if idx:
+            columns.extend(gap)
+        columns.extend(glyph(char, shade))
+    return tuple(columns)
+
+
+def bitmap(rows):
+    """Returns the raster of a bitmap given as rows of characters.
+
+    '#' is the darkest shade, '.' an empty day, the digits 0 to 4 stand
+    for the respective shade and a space leaves a day as it is.
+    """
+
+    try:
+        return _columns([[PIXELS[pixel] for pixel in row] for row in rows])
+    except KeyError as exc:
+        raise ValueError('Invalid pixel {}'.format(exc))
+
+
+def image(pixels):
+    """Returns the raster of a grayscale image.
+
+    pixels is a list of rows of luminance values between 0 and 255, or
+    an image object offering convert(), getdata() and size like those
+    of PIL. Darker pixels map to darker shades.
+    """
+
+    if hasattr(pixels, 'getdata'):
+        # PIL.Image.Image
+        gray = pixels.convert('L')
+        width = gray.size[0]
+        data = list(gray.getdata())
+        pixels = [data[i:i + width] for i in range(0, len(data), width)]
+
+    return _columns([
+        [(255 - int(value)) * 5 // 256 for value in row] for row in pixels
+    ])
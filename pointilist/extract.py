@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Incremental extraction of the contribution calendar from HTML pages.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import codecs
+from html.parser import HTMLParser
+
+CALENDAR_CLASS = 'js-calendar-graph-svg'
+
+
+class CalendarExtractor(HTMLParser):
+    """HTML tokenizer that captures only the contribution calendar.
+
+    Data is fed in chunks of bytes (decoded as UTF-8) or text. Anything
+    outside the first svg element whose classes include CALENDAR_CLASS
+    is tokenized and dropped. Within it, handle(tag, attrs, text) is
+    called for every element when it ends, text being the data directly
+    inside the element or None. Once the calendar has been closed, done
+    is set and further data is ignored.
+    """
+
+    def __init__(self, handle):
+        super().__init__(convert_charrefs=True)
+        self.handle = handle
+        self.root = None
+        self.found = False
+        self.done = False
+        self._stack = []
+        self._decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def feed(self, data):
+        """Feeds a chunk of the page to the tokenizer."""
+
+        if self.done:
+            return
+        if isinstance(data, bytes):
+            data = self._decoder.decode(data)
+        super().feed(data)
+
+    def close(self):
+        """Processes any buffered data."""
+
+        if not self.done:
+            super().feed(self._decoder.decode(b'', True))
+            super().close()
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if self.root is None:
+            self.root = tag
+        attrs = dict(attrs)
+        if not self._stack:
+            if tag != 'svg' or \
+                    CALENDAR_CLASS not in (attrs.get('class') or '').split():
+                return
+            self.found = True
+        self._stack.append((tag, attrs, []))
+
+    def handle_endtag(self, tag):
+        if self.done or tag not in (name for name, _, _ in self._stack):
+            return
+
+        # elements that were left open end with their parent
+        while True:
+            name, attrs, text = self._stack.pop()
+            self.handle(name, attrs, ''.join(text) or None)
+            if name == tag:
+                break
+        if not self._stack:
+            self.done = True
+
+    def handle_data(self, data):
+        if self._stack and not self.done:
+            self._stack[-1][2].append(data)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Retrieves the contribution graphs of many users concurrently.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import concurrent.futures
+import time
+from urllib.error import HTTPError
+
+import certifi
+import urllib3
+
+from pointilist import instrument
+from pointilist.cache import collect, join
+from pointilist.futures import as_completed
+from pointilist.graph import CHUNK_SIZE, GITHUB_URL, Graph
+
+
+def make_pool(concurrency=4, **kwargs):
+    """Creates a keep-alive connection pool sized for concurrency.
+
+    Further keyword arguments, e.g. retries or timeout, are passed on
+    to the connection pools.
+    """
+
+    return urllib3.PoolManager(
+        maxsize=concurrency,
+        block=True,
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=certifi.where(),
+        **kwargs
+    )
+
+
+def fetch_graph(graph, pool, base_url=GITHUB_URL, cache=None,
+                timeout=None):
+    """Retrieves contribution data for graph using a pooled connection.
+
+    Raises HTTPError for error responses, just like Graph.fetch(). If
+    a GraphCache is given, fresh entries are used without a request and
+    stale ones are revalidated with a conditional request. timeout is
+    passed to urllib3 and defaults to that of the pool.
+    """
+
+    entry = None
+    if cache is not None:
+        entry = cache.get(graph.username)
+        if entry is not None and cache.fresh(entry):
+            graph.data = entry['data']
+            return graph
+
+    url = graph.url(base_url)
+    options = {} if timeout is None else {'timeout': timeout}
+    start = time.perf_counter()
+    resp = pool.request(
+        'GET', url,
+        headers=cache.validators(entry) if cache is not None else None,
+        preload_content=False,
+        **options
+    )
+    network = time.perf_counter() - start
+    try:
+        if resp.status == 304 and entry is not None:
+            instrument.record('network', network)
+            cache.touch(graph.username, entry)
+            graph.data = entry['data']
+            return graph
+        if resp.status >= 400:
+            # the connection can only be reused once the body was read
+            resp.drain_conn()
+            raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        if cache is None:
+            stopped = graph._load(resp.stream(CHUNK_SIZE), network)
+        else:
+            body = []
+            stopped = graph._load(
+                collect(resp.stream(CHUNK_SIZE), body), network
+            )
+            cache.put(graph.username, join(body), resp.headers, graph.data)
+        if stopped:
+            # drop the connection rather than read the rest of the page
+            resp.close()
+    finally:
+        resp.release_conn()
+
+    return graph
+
+
+def fetch_many(usernames, concurrency=4, base_url=GITHUB_URL, pool=None,
+               cache=None):
+    """Retrieves the contribution graphs of several users.
+
+    Up to concurrency requests are in flight at any time, all sharing
+    one pool of keep-alive connections. Yields (graph, error) tuples in
+    the order in which the requests complete; error is None if the
+    graph was fetched successfully and the raised exception otherwise.
+    See fetch_graph() for the use of cache.
+    """
+
+    if pool is None:
+        pool = make_pool(concurrency)
+
+    tasks = (
+        (graph, fetch_graph, (graph, pool, base_url, cache))
+        for graph in (Graph(username) for username in usernames)
+    )
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        for graph, future in as_completed(
+                executor, lambda: next(tasks, None), concurrency):
+            yield graph, future.exception()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Runs tasks on an executor with a bounded number of them pending.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import concurrent.futures
+
+
+def as_completed(executor, next_task, limit):
+    """Submits tasks to executor, keeping at most limit of them pending.
+
+    next_task() returns the next task as a (key, fn, args) tuple, or
+    None if there is none at the moment. It is called again whenever a
+    task completed, so tasks may be added while iterating. Yields
+    (key, future) tuples in the order in which the tasks complete until
+    none is pending.
+    """
+
+    pending = {}
+
+    def submit():
+        while len(pending) < limit:
+            task = next_task()
+            if task is None:
+                break
+            key, fn, args = task
+            pending[executor.submit(fn, *args)] = key
+
+    submit()
+    while pending:
+        done, _ = concurrent.futures.wait(
+            pending, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        for future in done:
+            yield pending.pop(future), future
+        submit()
@@ -9,58 +9,250 @@
     :license: MIT, see LICENSE for details.
 """
 
+import bisect
+import collections.abc
+import hashlib
 import random
 import logging
-import urllib.request
-import xml.etree.ElementTree as ET
+import sys
+import time
+from array import array
+
+from pointilist import instrument
+from pointilist.rects import (
+    CommitArray, RectArray, date_to_ordinal, iter_records, ordinal_to_date
+)
 
 FILL_DEFAULT = ['#ebedf0', '#c6e48b', '#7bc96f', '#239a3b', '#196127']
 RANDOM_BIAS = [0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 4]
+# shade n > 0 ends at max_count / SHADE_DIVISORS[n - 1]
+SHADE_DIVISORS = [6, 3, 2, 1]
+CHUNK_SIZE = 16384
+# largest response accepted before the end of the calendar
+MAX_BODY_SIZE = 8 * 1024 * 1024
+GITHUB_URL = 'https://github.com'
 
 
-class Graph:
-    """Object that represents a user's github contribution graph."""
+class _GraphParser:
+    """Single pass, incremental parser for contribution graph data.
 
-    def __init__(self, username):
-        self.username = username
-        self.data = {}
+    Validates the document and extracts the day rects, month and
+    weekday labels while data is fed to it. Elements are discarded
+    as soon as they have been processed.
 
-    @staticmethod
-    def _graph_data_valid(data):
-        """Makes sure input data looks like a valid contribution graph."""
+    The data may be the calendar svg itself or a full HTML page holding
+    it, which is tokenized by a CalendarExtractor. Either way done is
+    set once the calendar has ended, and at most max_size bytes are
+    accepted before that.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = MAX_BODY_SIZE if max_size is None else max_size
+        self.size = 0
+        self._head = None
+        self._parser = None
+        self._xml = False
+        self._closed = False
+        self._stack = []
+        self.data = {'rects': RectArray(), 'months': [], 'wdays': []}
+
+    @property
+    def done(self):
+        """True once the calendar has ended and no data is needed."""
 
-        rect_count = 0
-        root = ET.fromstring(data)
+        if self._parser is None:
+            return False
+        if self._xml:
+            return self._closed
+        return self._parser.done
 
+    def _start(self, head):
+        sniff = head.decode('utf-8', 'replace') \
+            if isinstance(head, bytes) else head
+        self._xml = sniff.lstrip('\ufeff \t\r\n').startswith(
+            ('<svg', '<?xml')
+        )
+        if self._xml:
+            # imported here so that offline use of graph data, e.g. by
+            # the command line tool, does not pay for loading the XML
+            # parser
+            import xml.etree.ElementTree as ET
+
+            self._parser = ET.XMLPullParser(events=('start', 'end'))
+        else:
+            from pointilist.extract import CalendarExtractor
+
+            self._parser = CalendarExtractor(self._handle)
+
+    @staticmethod
+    def _check_root(tag, attrs):
         # check if data is an SVG file
-        if root.tag != 'svg':
-            raise ValueError('Expected svg, got {}'.format(root.tag))
+        if tag != 'svg':
+            raise ValueError('Expected svg, got {}'.format(tag))
 
         # check if SVG class is correct
-        if root.get('class') != 'js-calendar-graph-svg':
+        if attrs.get('class') != 'js-calendar-graph-svg':
             raise ValueError(
                 'Expected class js-calendar-graph-svg, got {}'.format(
-                    root.get('class')
+                    attrs.get('class')
                 )
             )
 
+    def _handle(self, tag, attrs, text):
+        cls = attrs.get('class')
+        if tag == 'rect' and cls == 'day':
+            self.data['rects'].append(
+                attrs.get('data-date'),
+                int(attrs.get('data-count')),
+                attrs.get('fill'),
+                int(attrs.get('x')),
+                int(attrs.get('y'))
+            )
+        elif tag == 'text' and cls == 'month':
+            self.data['months'].append({
+                'month': text,
+                'x': int(attrs.get('x')),
+                'y': int(attrs.get('y'))
+            })
+        elif tag == 'text' and cls == 'wday':
+            self.data['wdays'].append({
+                'wday': text,
+                'display': attrs.get('style') != "display: none;",
+                'x': int(attrs.get('dx')),
+                'y': int(attrs.get('dy'))
+            })
+
+    def _process(self):
+        for event, elem in self._parser.read_events():
+            if self._closed:
+                continue
+            if event == 'start':
+                if not self._stack:
+                    self._check_root(elem.tag, elem.attrib)
+                self._stack.append(elem)
+                continue
+
+            self._stack.pop()
+            self._handle(elem.tag, elem.attrib, elem.text)
+            elem.clear()
+            if self._stack:
+                self._stack[-1].remove(elem)
+            else:
+                self._closed = True
+
+    def feed(self, data):
+        """Feeds a chunk of graph data to the parser."""
+
+        if self.done:
+            return
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise ValueError(
+                'Graph data exceeds {} bytes'.format(self.max_size)
+            )
+
+        if self._parser is None:
+            # wait for the first tag to tell svg from HTML
+            data = data if self._head is None else self._head + data
+            if len(data.lstrip()) < 5:
+                self._head = data
+                return
+            self._head = None
+            self._start(data)
+
+        self._parser.feed(data)
+        if self._xml:
+            self._process()
+
+    def close(self):
+        """Finishes parsing and returns the extracted graph data."""
+
+        if self._parser is None:
+            self._start(self._head or '')
+            if self._head:
+                self._parser.feed(self._head)
+        if self._xml:
+            if not self._closed:
+                self._parser.close()
+                self._process()
+        else:
+            self._parser.close()
+            if not self._parser.found:
+                self._check_root(self._parser.root or 'nothing', {})
+            if not self._parser.done:
+                raise ValueError('Contribution calendar is truncated')
+
         # check if there are at least 365 days worth of data
-        for rect in root.iter('rect'):
-            if rect.get('class') == 'day':
-                rect_count += 1
+        rect_count = len(self.data['rects'])
         if rect_count < 365:
             raise ValueError(
                 'Too few data points in graph: {} < 365'.format(rect_count)
             )
 
+        return self.data
+
+    @classmethod
+    def parse(cls, data):
+        """Parses in-memory graph data chunk by chunk."""
+
+        parser = cls()
+        for i in range(0, len(data), CHUNK_SIZE):
+            parser.feed(data[i:i + CHUNK_SIZE])
+        return parser.close()
+
+
+class Graph:
+    """Object that represents a user's github contribution graph."""
+
+    def __init__(self, username):
+        self.username = username
+        self.data = {}
+        self._count_index = {}
+        self._shade_table = None
+
+    @staticmethod
+    def _graph_data_valid(data):
+        """Makes sure input data looks like a valid contribution graph."""
+
+        with instrument.span('validate'):
+            _GraphParser.parse(data)
+
+    def _rects(self):
+        """Returns the day rects in columnar form."""
+
+        return RectArray.from_dicts(self.data['rects'])
+
+    def _require_data(self):
+        if self.data == {}:
+            raise ValueError(
+                'Graph data empty; maybe you need to call fetch() first?'
+            )
+
+    def _index_counts(self):
+        """Builds a histogram of commit counts in a single pass.
+
+        Maps every distinct count to the number of days having it and
+        to the index and fill of the first such day.
+        """
+
+        rects = self._rects()
+        index = {}
+        for idx, count in enumerate(rects.counts):
+            try:
+                index[count][0] += 1
+            except KeyError:
+                index[count] = [1, idx, rects.fill(idx)]
+        self._count_index = index
+
     def _get_fill(self, idx, count):
-        try:
-            return next(
-                filter(lambda x: x['count'] in count, self.data['rects'])
-            )['fill']
-        except StopIteration:
-            logging.info("Using default fill for %s.", count)
-            return FILL_DEFAULT[idx]
+        matches = [
+            entry for c, entry in self._count_index.items() if c in count
+        ]
+        if matches:
+            return min(matches, key=lambda e: e[1])[2]
+
+        logging.info("Using default fill for %s.", count)
+        return FILL_DEFAULT[idx]
 
     def _create_colormap(self):
         """ Creates a map that determines the color
@@ -74,89 +266,476 @@ class Graph:
             count > max_count/2            => color4 (#1961270
         """
 
-        max_count = max(self.data['rects'], key=lambda r: r['count'])['count']
-        ranges_list = [
-            [
-                int(max_count/x[0])+1,
-                int(max_count/x[1])+1
-            ] for x in [[6, 3], [3, 2], [2, 1]]
-        ]
-        ranges_list = [[0, 1]] + [[1, ranges_list[0][0]]] + ranges_list
-
-        self.data['colormap'] = [
-            {
-                'fill': self._get_fill(
-                    i,
-                    range(
-                        ranges_list[i][0],
-                        ranges_list[i][1]
-                    )
-                ),
-                'range': range(
-                    ranges_list[i][0],
-                    ranges_list[i][1]
+        with instrument.span('colormap'):
+            self._index_counts()
+            self.data['colormap'] = [
+                {
+                    'fill': self._get_fill(i, count_range),
+                    'range': count_range
+                } for i, count_range in enumerate(
+                    shade_ranges(max(self._count_index))
                 )
-            } for i in range(0, 5)
-        ]
+            ]
+
+    def _thresholds(self):
+        colormap = self.data['colormap']
+        if self._shade_table is None or self._shade_table[0] is not colormap:
+            self._shade_table = (
+                colormap, [shade['range'].start for shade in colormap]
+            )
+        return self._shade_table[1]
+
+    def shade_for(self, count):
+        """Returns the colormap index for a given commit count.
+
+        The lookup is a bisection over the five bucket thresholds and
+        thus takes constant time regardless of the size of the graph.
+        Counts above the highest existing count map to the darkest shade.
+        """
+
+        self._require_data()
+        if count < 0:
+            raise ValueError('Invalid commit count: {}'.format(count))
+
+        return bisect.bisect_right(self._thresholds(), count) - 1
+
+    @property
+    def fingerprint(self):
+        """Hex digest of the parsed day rects and the colormap.
+
+        It only depends on the graph data, not on the username or on how
+        the data was obtained, and is the same on every machine.
+        """
+
+        self._require_data()
+        rects = self._rects()
+        sha = hashlib.sha256()
+        for column in [rects.dates, rects.counts, rects.x, rects.y]:
+            column = array('i', column)
+            if sys.byteorder != 'little':
+                column.byteswap()
+            sha.update(column)
+        sha.update('\n'.join(
+            rects.palette[fill] for fill in rects.fills
+        ).encode())
+        sha.update(''.join(
+            '\n{} {} {}'.format(
+                shade['fill'], shade['range'].start, shade['range'].stop
+            ) for shade in self.data['colormap']
+        ).encode())
+        return sha.hexdigest()
 
     def _parse_graph_data(self, graph_data):
-        root = ET.fromstring(graph_data)
-
-        self.data['rects'] = [
-            {
-                'date': rect.get('data-date'),
-                'count': int(rect.get('data-count')),
-                'fill': rect.get('fill'),
-                'x': int(rect.get('x')),
-                'y': int(rect.get('y'))
-            } for rect in root.iter('rect') if rect.get('class') == 'day'
-        ]
+        with instrument.span('parse'):
+            self.data = _GraphParser.parse(graph_data)
+        instrument.count('rects_parsed', len(self.data['rects']))
 
-        self.data['months'] = [
-            {
-                'month': text.text,
-                'x': int(text.get('x')),
-                'y': int(text.get('y'))
-            } for text in root.iter('text') if text.get('class') == 'month'
-        ]
+        self._create_colormap()
 
-        self.data['wdays'] = [
-            {
-                'wday': text.text,
-                'display': text.get('style') != "display: none;",
-                'x': int(text.get('dx')),
-                'y': int(text.get('dy'))
-            } for text in root.iter('text') if text.get('class') == 'wday'
-        ]
+    def url(self, base_url=GITHUB_URL):
+        """Returns the URL of the user's contribution data."""
+
+        return base_url + '/users/' + self.username + '/contributions'
+
+    def _load(self, chunks, network=0.0):
+        """Parses graph data from an iterable of chunks.
+
+        network is the time already spent waiting for the response; it
+        is reported together with the time spent waiting for chunks.
+        Stops reading once the calendar has ended and returns True if
+        chunks were left unread.
+        """
+
+        parser = _GraphParser()
+        meter = None
+        if instrument.enabled():
+            meter = [0.0, 0]
+            chunks = _metered(chunks, meter)
+            start = time.perf_counter()
+
+        stopped = False
+        for chunk in chunks:
+            parser.feed(chunk)
+            if parser.done:
+                stopped = True
+                break
+        self.data = parser.close()
+
+        if meter is not None:
+            instrument.record('network', network + meter[0])
+            instrument.record(
+                'parse', time.perf_counter() - start - meter[0]
+            )
+            instrument.count('bytes_fetched', meter[1])
+            instrument.count('rects_parsed', len(self.data['rects']))
 
         self._create_colormap()
+        return stopped
 
-    def fetch(self):
-        """Retrieves contribution data from github."""
+    def fetch(self, base_url=GITHUB_URL):
+        """Retrieves contribution data from github.
 
-        url = 'https://github.com/users/' + self.username + '/contributions'
-        page = urllib.request.urlopen(url)
-        graph_data = page.read()
+        The response is validated and parsed incrementally while it is
+        being read, so an invalid graph is rejected as soon as possible.
+        The rest of the response is not read once the calendar has
+        ended, so it may be embedded in a full HTML page.
+        """
 
-        self._graph_data_valid(graph_data)
-        self._parse_graph_data(graph_data)
+        import urllib.request
 
-    def fill(self):
-        """Fills contribution graph with random data."""
+        start = time.perf_counter()
+        with urllib.request.urlopen(self.url(base_url)) as page:
+            self._load(
+                iter(lambda: page.read(CHUNK_SIZE), page.read(0)),
+                time.perf_counter() - start
+            )
 
-        if self.data == {}:
+    async def fetch_async(self, base_url=GITHUB_URL, timeout=None):
+        """Coroutine that retrieves contribution data like fetch().
+
+        The response is parsed chunk by chunk as it arrives, without
+        blocking the event loop while waiting for the network. timeout
+        applies to connecting and to every single read.
+        """
+
+        from pointilist import aio
+
+        clock = time.perf_counter
+        start = clock()
+        response = await aio.get(self.url(base_url), timeout=timeout)
+        network = clock() - start
+        parse = 0.0
+        size = 0
+        try:
+            parser = _GraphParser()
+            while True:
+                start = clock()
+                chunk = await response.read(CHUNK_SIZE)
+                network += clock() - start
+                if not chunk:
+                    break
+                size += len(chunk)
+                start = clock()
+                parser.feed(chunk)
+                parse += clock() - start
+                if parser.done:
+                    break
+            start = clock()
+            self.data = parser.close()
+            parse += clock() - start
+        finally:
+            response.close()
+
+        instrument.record('network', network)
+        instrument.record('parse', parse)
+        instrument.count('bytes_fetched', size)
+        instrument.count('rects_parsed', len(self.data['rects']))
+        self._create_colormap()
+
+    def save(self, path):
+        """Saves the parsed graph data as a binary snapshot.
+
+        See pointilist.snapshot for the format.
+        """
+
+        from pointilist import snapshot
+
+        self._require_data()
+        snapshot.save(path, self.username, self.data)
+
+    @classmethod
+    def load(cls, path):
+        """Returns a Graph holding the data of a snapshot."""
+
+        from pointilist import snapshot
+
+        username, data = snapshot.load(path)
+        graph = cls(username)
+        graph.data = data
+        graph._create_colormap()
+        return graph
+
+    def _empty_days(self):
+        rects = self._rects()
+        return [
+            date for date, count in zip(rects.dates, rects.counts)
+            if count == 0
+        ]
+
+    def fill(self, seed=None):
+        """Fills contribution graph with random data.
+
+        The random source may be given as an int seed, a random.Random
+        instance or a numpy Generator to get reproducible results;
+        by default it is seeded from OS entropy. The planned commits
+        are stored in data['commits'] and returned as a CommitArray.
+        """
+
+        return fill_many([self], seed)[0]
+
+    def fill_shades(self, shades):
+        """Plans the fewest commits that give days the wanted shades.
+
+        shades holds a shade between 0 and 4, or None, for every day in
+        the order of data['rects'], or maps dates ('YYYY-MM-DD' strings
+        or ordinals) to shades. Days without a shade keep their count,
+        unless one of them has to carry a new maximum count; see
+        solve_shades(). The planned commits are stored in
+        data['commits'] and returned as a CommitArray.
+        """
+
+        self._require_data()
+        rects = self._rects()
+
+        if isinstance(shades, collections.abc.Mapping):
+            wanted = {
+                date_to_ordinal(date) if isinstance(date, str) else date:
+                shade for date, shade in shades.items()
+            }
+            unknown = set(wanted).difference(rects.dates)
+            if unknown:
+                raise ValueError('Dates not in graph: {}'.format(
+                    ', '.join(ordinal_to_date(d) for d in sorted(unknown))
+                ))
+            shades = [wanted.get(date) for date in rects.dates]
+        elif len(shades) != len(rects):
+            raise ValueError('Expected {} shades, got {}'.format(
+                len(rects), len(shades)
+            ))
+
+        with instrument.span('fill'):
+            added = solve_shades(rects.counts, shades)
+            commits = CommitArray()
+            for date, count in zip(rects.dates, added):
+                if count:
+                    commits.append(date, count)
+
+        self.data['commits'] = commits
+        return commits
+
+    def _grid(self):
+        """Maps (column, row) cells of the calendar to day indexes.
+
+        Every distinct x coordinate of the day rects is a column, in the
+        order of the days, and every distinct y coordinate a row.
+        Returns the map and the number of columns.
+        """
+
+        rects = self._rects()
+        rows = {y: row for row, y in enumerate(sorted(set(rects.y)))}
+        columns = {}
+        grid = {}
+        for idx, (x, y) in enumerate(zip(rects.x, rects.y)):
+            grid[columns.setdefault(x, len(columns)), rows[y]] = idx
+        return grid, len(columns)
+
+    def draw(self, raster, column=None, background=None):
+        """Plans the fewest commits that draw a raster onto the graph.
+
+        raster is a tuple of columns of shades as returned by the
+        functions of pointilist.draw. It is placed with its left edge
+        at the given column of the calendar, or centered by default;
+        cells beyond the first or last day are skipped. All other days
+        get the shade background, None leaving them as they are. The
+        commits are planned by fill_shades().
+        """
+
+        self._require_data()
+        grid, width = self._grid()
+        if column is None:
+            column = (width - len(raster)) // 2
+        if column < 0 or column + len(raster) > width:
             raise ValueError(
-                'Graph data empty; maybe you need to call fetch() first?'
+                'Raster of {} columns does not fit at column {} of {}'.format(
+                    len(raster), column, width
+                )
             )
 
-        random.seed()
-        self.data['commits'] = []
-        for rect in self.data['rects']:
-            if rect['count'] == 0:
-                i = RANDOM_BIAS[random.randint(0, len(RANDOM_BIAS)-1)]
-                self.data['commits'].append(
-                    {
-                        'date': rect['date'],
-                        'count': self.data['colormap'][i]['range'].start
-                    }
-                )
+        shades = [background] * len(self.data['rects'])
+        for col, cells in enumerate(raster, column):
+            for row, shade in enumerate(cells):
+                idx = grid.get((col, row))
+                if idx is not None and shade is not None:
+                    shades[idx] = shade
+
+        return self.fill_shades(shades)
+
+    def commits(self):
+        """Returns an iterator over the planned commits.
+
+        Yields (date ordinal, count) records, which can be passed to
+        Repo directly without building any intermediate list.
+        """
+
+        if 'commits' not in self.data:
+            raise ValueError(
+                'No commits planned; maybe you need to call fill() first?'
+            )
+
+        return iter_records(self.data['commits'])
+
+
+_END = object()
+
+
+def _metered(chunks, meter):
+    """Passes chunks through while metering them.
+
+    Adds the time spent waiting for chunks to meter[0] and their total
+    size to meter[1].
+    """
+
+    clock = time.perf_counter
+    chunks = iter(chunks)
+    while True:
+        start = clock()
+        chunk = next(chunks, _END)
+        meter[0] += clock() - start
+        if chunk is _END:
+            return
+        meter[1] += len(chunk)
+        yield chunk
+
+
+def _make_rng(seed):
+    if seed is None or isinstance(seed, int):
+        return random.Random(seed)
+    return seed
+
+
+def _draw(rng, population, k):
+    """Draws k samples from population with replacement."""
+
+    if hasattr(rng, 'integers'):
+        # numpy.random.Generator, in a single call
+        return [population[i] for i in rng.integers(len(population), size=k)]
+    choices = getattr(rng, 'choices', None)
+    if choices is not None:
+        return choices(population, k=k)
+    # random.Random.choices() requires Python 3.6
+    size = len(population)
+    return [population[rng.randrange(size)] for _ in range(k)]
+
+
+def fill_many(graphs, seed=None):
+    """Fills several contribution graphs with random data at once.
+
+    The shades for all empty days of all graphs are sampled from
+    RANDOM_BIAS in a single draw. Returns one CommitArray per graph,
+    which is also stored in the respective graph's data['commits'].
+    See Graph.fill() for the accepted values of seed.
+    """
+
+    with instrument.span('fill'):
+        rng = _make_rng(seed)
+
+        plans = []
+        for graph in graphs:
+            graph._require_data()
+            plans.append((graph, graph._empty_days()))
+
+        shades = _draw(
+            rng, RANDOM_BIAS, sum(len(days) for _, days in plans)
+        )
+
+        result = []
+        pos = 0
+        for graph, days in plans:
+            starts = [
+                shade['range'].start for shade in graph.data['colormap']
+            ]
+            commits = CommitArray(
+                days, [starts[s] for s in shades[pos:pos + len(days)]]
+            )
+            pos += len(days)
+            graph.data['commits'] = commits
+            result.append(commits)
+
+    return result
+
+
+def shade_ranges(max_count):
+    """Returns the range of counts of every shade for a max_count.
+
+    count == 0                     => shade 0
+    1 <= count <= max_count/6      => shade 1
+    max_count/6 < x <= max_count/3 => shade 2
+    max_count/3 < x <= max_count/2 => shade 3
+    count > max_count/2            => shade 4
+    """
+
+    starts = [0, 1] + [int(max_count / d) + 1 for d in SHADE_DIVISORS]
+    return [range(starts[i], starts[i + 1]) for i in range(5)]
+
+
+def _shade_plan(counts, shades, max_count):
+    """Returns the commits to add for a given resulting max_count.
+
+    Returns None if the shades cannot be reached with that maximum.
+    """
+
+    ranges = shade_ranges(max_count)
+    added = []
+    reached = False
+    cheapest = None
+    for idx, (count, shade) in enumerate(zip(counts, shades)):
+        if shade is None:
+            target = count
+            span = range(count, max_count + 1)
+        else:
+            span = ranges[shade]
+            target = max(count, span.start)
+            if target not in span:
+                return None
+        added.append(target - count)
+
+        # some day has to end up with exactly max_count commits
+        if target == max_count:
+            reached = True
+        elif max_count in span and (
+                cheapest is None or max_count - target < cheapest[0]):
+            cheapest = (max_count - target, idx)
+
+    if not reached:
+        if cheapest is None:
+            return None
+        added[cheapest[1]] += cheapest[0]
+    return added
+
+
+def solve_shades(counts, shades):
+    """Returns the fewest commits to add to every day to get shades.
+
+    counts are the current counts of the days and shades the wanted
+    shade of every day, or None if a day may have any shade. As commits
+    can only be added, the thresholds between shades move up once a day
+    exceeds the current maximum count, which may be necessary to keep
+    days with many commits in a light shade.
+    """
+
+    current = max(counts, default=0)
+    start = current
+    for count, shade in zip(counts, shades):
+        if shade is None:
+            continue
+        if shade not in range(5):
+            raise ValueError('Invalid shade: {}'.format(shade))
+        if shade == 0 and count:
+            raise ValueError(
+                'Cannot clear a day with {} commits'.format(count)
+            )
+        if 0 < shade < 4:
+            # count has to stay at or below max_count / divisor
+            start = max(start, count * SHADE_DIVISORS[shade - 1])
+
+    # each day's minimal count only grows with max_count, so the first
+    # feasible max_count is optimal; above 6, all shades are non-empty
+    # and feasibility does not change any more
+    for max_count in range(start, max(start, 6) + 1):
+        added = _shade_plan(counts, shades, max_count)
+        if added is not None:
+            return added
+
+    raise ValueError(
+        'Shades cannot be reached: no day may hold the maximum count'
+    )
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Contribution history spanning any number of days.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import collections.abc
+from array import array
+
+from pointilist.rects import date_to_ordinal, iter_records
+
+UNKNOWN = -1
+
+
+def _ordinal(date):
+    return date_to_ordinal(date) if isinstance(date, str) else date
+
+
+def _records(days):
+    """Returns (date, count) records of days, see Calendar.merge()."""
+
+    if isinstance(days, Calendar):
+        return days.items()
+    if hasattr(days, 'dates') and hasattr(days, 'counts'):
+        # RectArray or CommitArray
+        return zip(days.dates, days.counts)
+    return iter_records(days)
+
+
+class Calendar(collections.abc.MutableMapping):
+    """Commit counts of days, keyed by their ordinal.
+
+    Days are kept in a single typed array that covers whole weeks,
+    starting on a Sunday, and grows in both directions as days are
+    added. Days inside that range but without data are UNKNOWN.
+
+    Looking up a day, as well as converting between a day and its
+    (week, weekday) cell, is a matter of index arithmetic. Weeks are
+    counted from the first week of the calendar, weekdays from Sunday.
+    Dates may be given as ordinals or as 'YYYY-MM-DD' strings; slicing
+    by dates returns a new Calendar.
+    """
+
+    def __init__(self, days=()):
+        self._origin = None
+        self._counts = array('i')
+        self._known = 0
+        self.merge(days)
+
+    @property
+    def first(self):
+        """Ordinal of the first day with data, or None."""
+
+        for idx, count in enumerate(self._counts):
+            if count != UNKNOWN:
+                return self._origin + idx
+        return None
+
+    @property
+    def last(self):
+        """Ordinal of the last day with data, or None."""
+
+        for idx in range(len(self._counts) - 1, -1, -1):
+            if self._counts[idx] != UNKNOWN:
+                return self._origin + idx
+        return None
+
+    @property
+    def weeks(self):
+        """Number of weeks covered by the calendar."""
+
+        return (len(self._counts) + 6) // 7
+
+    def _reserve(self, first, last):
+        """Grows the array to cover the days first to last."""
+
+        origin = first - first % 7
+        if self._origin is None:
+            self._origin = origin
+        elif origin < self._origin:
+            self._counts = (
+                array('i', [UNKNOWN]) * (self._origin - origin)
+                + self._counts
+            )
+            self._origin = origin
+
+        missing = last - self._origin + 1 - len(self._counts)
+        if missing > 0:
+            # pad to whole weeks
+            missing += (7 - (last + 1) % 7) % 7
+            self._counts.extend(array('i', [UNKNOWN]) * missing)
+
+    def _index(self, date):
+        if self._origin is None:
+            return None
+        idx = _ordinal(date) - self._origin
+        if 0 <= idx < len(self._counts):
+            return idx
+        return None
+
+    def __getitem__(self, date):
+        if isinstance(date, slice):
+            return self._slice(date)
+        idx = self._index(date)
+        if idx is None or self._counts[idx] == UNKNOWN:
+            raise KeyError(date)
+        return self._counts[idx]
+
+    def __setitem__(self, date, count):
+        if count < 0:
+            raise ValueError('Invalid commit count: {}'.format(count))
+        date = _ordinal(date)
+        idx = self._index(date)
+        if idx is None:
+            self._reserve(date, date)
+            idx = date - self._origin
+        if self._counts[idx] == UNKNOWN:
+            self._known += 1
+        self._counts[idx] = count
+
+    def __delitem__(self, date):
+        idx = self._index(date)
+        if idx is None or self._counts[idx] == UNKNOWN:
+            raise KeyError(date)
+        self._counts[idx] = UNKNOWN
+        self._known -= 1
+
+    def __len__(self):
+        return self._known
+
+    def __iter__(self):
+        for idx, count in enumerate(self._counts):
+            if count != UNKNOWN:
+                yield self._origin + idx
+
+    def items(self):
+        """Yields the (date ordinal, count) records of all known days."""
+
+        for idx, count in enumerate(self._counts):
+            if count != UNKNOWN:
+                yield self._origin + idx, count
+
+    def _slice(self, key):
+        if key.step is not None:
+            raise ValueError('Calendar slices do not support steps')
+
+        result = Calendar()
+        if self._origin is None:
+            return result
+        end = self._origin + len(self._counts)
+        start = self._origin if key.start is None else max(
+            _ordinal(key.start), self._origin
+        )
+        stop = end if key.stop is None else min(_ordinal(key.stop), end)
+        if start >= stop:
+            return result
+
+        result._origin = start - start % 7
+        result._counts = (
+            array('i', [UNKNOWN]) * (start - result._origin)
+            + self._counts[start - self._origin:stop - self._origin]
+        )
+        result._known = len(result._counts) - result._counts.count(UNKNOWN)
+        return result
+
+    def cell(self, date):
+        """Returns the (week, weekday) cell of a day of the calendar."""
+
+        idx = self._index(date)
+        if idx is None:
+            raise KeyError(date)
+        return divmod(idx, 7)
+
+    def date(self, week, weekday):
+        """Returns the ordinal of the day in a (week, weekday) cell."""
+
+        if not 0 <= weekday < 7 or not 0 <= week < self.weeks:
+            raise KeyError((week, weekday))
+        return self._origin + 7 * week + weekday
+
+    def merge(self, days):
+        """Merges the counts of days, replacing those of known days.
+
+        days may be another Calendar, a RectArray such as the rects of
+        a fetched Graph, a CommitArray or any records accepted by
+        iter_records(). Merging overlapping windows fetched at different
+        times thus keeps the most recently merged counts.
+        """
+
+        records = _records(days)
+        if isinstance(days, collections.abc.Sized) and len(days):
+            # one allocation for the whole range of a known size
+            if isinstance(days, Calendar):
+                self._reserve(days.first, days.last)
+            elif hasattr(days, 'dates'):
+                self._reserve(min(days.dates), max(days.dates))
+        for date, count in records:
+            self[date] = count
+
+    def add(self, days):
+        """Adds the counts of days, e.g. a commit plan, to the calendar.
+
+        Unknown days are counted as days without commits.
+        """
+
+        for date, count in _records(days):
+            self[date] = self.get(date, 0) + count
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Lightweight timing and counter instrumentation.
+
+    pointilist reports the duration of its stages as named spans and
+    the amount of work done as counters to every registered sink:
+
+    spans:    network, validate, parse, colormap, fill, write, push
+    counters: bytes_fetched, rects_parsed, commits_written,
+              objects_written, objects_reused, bytes_pushed
+
+    A sink is a callable taking (kind, name, value), where kind is
+    'span' with the duration in seconds as value, or 'counter' with the
+    increment as value. Without registered sinks, instrumentation is
+    reduced to a single list check per call site.
+
+    Sinks are registered per process, so work done in the worker
+    processes of pointilist.batch is not reported to the parent.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import logging
+import threading
+import time
+
+_sinks = []
+_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """Registers a sink for all spans and counters."""
+
+    global _sinks
+    with _lock:
+        _sinks = _sinks + [sink]
+
+
+def remove_sink(sink):
+    """Unregisters a sink previously passed to add_sink()."""
+
+    global _sinks
+    with _lock:
+        _sinks = [s for s in _sinks if s is not sink]
+
+
+def enabled():
+    """Returns True if at least one sink is registered."""
+
+    return bool(_sinks)
+
+
+def _emit(kind, name, value):
+    for sink in _sinks:
+        try:
+            sink(kind, name, value)
+        except Exception:  # pylint: disable=broad-except
+            logging.exception('Instrumentation sink %r failed.', sink)
+
+
+def record(name, seconds):
+    """Reports a span that was timed by the caller."""
+
+    if _sinks:
+        _emit('span', name, seconds)
+
+
+def count(name, value=1):
+    """Increments a counter."""
+
+    if _sinks:
+        _emit('counter', name, value)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _emit('span', self.name, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Returns a context manager that reports its duration as a span."""
+
+    if not _sinks:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+class Recorder:
+    """Sink that keeps all reported values in memory.
+
+    spans maps every span name to the list of its durations, counters
+    maps every counter name to its total.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, kind, name, value):
+        with self._lock:
+            if kind == 'span':
+                self.spans.setdefault(name, []).append(value)
+            else:
+                self.counters[name] = self.counters.get(name, 0) + value
@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Serializes git objects and writes them as packfiles.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import collections
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+from pointilist import instrument
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+
+TYPE_NAMES = {
+    OBJ_COMMIT: b'commit',
+    OBJ_TREE: b'tree',
+    OBJ_BLOB: b'blob'
+}
+
+
+def hash_object(obj_type, data):
+    """Returns the binary SHA-1 of a git object."""
+
+    sha = hashlib.sha1(
+        TYPE_NAMES[obj_type] + b' ' + str(len(data)).encode() + b'\0'
+    )
+    sha.update(data)
+    return sha.digest()
+
+
+def serialize_tree(entries):
+    """Serializes a tree from (mode, name, binary sha) tuples."""
+
+    return b''.join(
+        mode + b' ' + name + b'\0' + sha
+        for mode, name, sha in sorted(entries, key=lambda e: e[1])
+    )
+
+
+def serialize_commit(tree, parents, author, timestamp, message):
+    """Serializes a commit authored and committed at timestamp (UTC)."""
+
+    ident = author + b' ' + str(timestamp).encode() + b' +0000'
+    lines = [b'tree ' + tree.hex().encode()]
+    lines += [b'parent ' + parent.hex().encode() for parent in parents]
+    lines += [b'author ' + ident, b'committer ' + ident, b'', message]
+    return b'\n'.join(lines)
+
+
+class CommitFactory:
+    """Produces commits that differ only in parent and timestamp.
+
+    The tree, author and message are formatted once; every commit is
+    then assembled from the preformatted pieces. The hash state of the
+    common object prefix is cached per object length, so only the
+    varying part of each commit is hashed.
+    """
+
+    def __init__(self, tree, author, message):
+        self._tree = b'tree ' + tree.hex().encode() + b'\n'
+        self._author = b'author ' + author + b' '
+        self._committer = b' +0000\ncommitter ' + author + b' '
+        self._message = b' +0000\n\n' + message
+        self._prefixes = {}
+
+    def commit(self, parent, timestamp):
+        """Returns (binary sha, serialized commit)."""
+
+        stamp = str(timestamp).encode()
+        body = b''.join([
+            b'parent ' + parent.hex().encode() + b'\n' if parent else b'',
+            self._author, stamp, self._committer, stamp, self._message
+        ])
+        size = len(self._tree) + len(body)
+
+        try:
+            prefix = self._prefixes[size]
+        except KeyError:
+            prefix = hashlib.sha1(
+                b'commit ' + str(size).encode() + b'\0' + self._tree
+            )
+            self._prefixes[size] = prefix
+
+        sha = prefix.copy()
+        sha.update(body)
+        return sha.digest(), self._tree + body
+
+
+def _entry_header(obj_type, size):
+    byte = (obj_type << 4) | (size & 0x0f)
+    size >>= 4
+    header = bytearray()
+    while size:
+        header.append(byte | 0x80)
+        byte = size & 0x7f
+        size >>= 7
+    header.append(byte)
+    return bytes(header)
+
+
+def encode_entry(obj_type, data, level=zlib.Z_DEFAULT_COMPRESSION):
+    """Encodes an object as a (non-delta) pack entry."""
+
+    return _entry_header(obj_type, len(data)) + zlib.compress(data, level)
+
+
+# objects repositories have in common; every commit has its own parent
+# and timestamp, so commits are not worth caching
+CACHED_TYPES = frozenset([OBJ_BLOB, OBJ_TREE])
+
+# number of commit templates kept, see ObjectCache.commit_factory()
+MAX_FACTORIES = 256
+
+
+class ObjectCache:
+    """Content-addressed cache of encoded objects shared by repositories.
+
+    Maps binary SHA-1s to pack entries, so that objects several
+    repositories have in common, like the blob and tree of the fake
+    file, are compressed only once; objects of other types than those
+    in types are encoded without the cache. Entries of up to max_size
+    bytes in total are kept in memory; the least recently used ones are
+    evicted first. If directory is given, evicted entries are moved
+    there, one file per object, and found again by later lookups,
+    including those of other processes. Once the directory holds more
+    than max_disk_size bytes, the files used least recently are removed.
+
+    The preformatted commit templates of commit_factory() are shared
+    as well. Thread-safe. Copies sent to other processes start with an
+    empty memory tier and share only the directory.
+    """
+
+    def __init__(self, max_size=32 * 1024 * 1024, directory=None,
+                 max_disk_size=256 * 1024 * 1024, types=CACHED_TYPES):
+        self.max_size = max_size
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.types = frozenset(types)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._factories = collections.OrderedDict()
+        self._disk_size = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {
+            'max_size': self.max_size,
+            'directory': self.directory,
+            'max_disk_size': self.max_disk_size,
+            'types': self.types
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _path(self, sha):
+        name = sha.hex()
+        return os.path.join(self.directory, name[:2], name[2:])
+
+    def _remember(self, sha, entry):
+        with self._lock:
+            if sha in self._entries:
+                self._entries.move_to_end(sha)
+                return
+            self._entries[sha] = entry
+            self.size += len(entry)
+            evicted = []
+            while self.size > self.max_size:
+                old = self._entries.popitem(last=False)
+                self.size -= len(old[1])
+                evicted.append(old)
+
+        if self.directory is not None:
+            for old in evicted:
+                self._spill(*old)
+
+    def _spill(self, sha, entry):
+        path = self._path(sha)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='tmp', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(entry)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        with self._lock:
+            if self._disk_size is not None:
+                self._disk_size += len(entry)
+            full = self._disk_size is None \
+                or self._disk_size > self.max_disk_size
+        if full:
+            self._trim()
+
+    def _trim(self):
+        """Removes the least recently used files from the directory until
+        it holds at most max_disk_size bytes.
+        """
+
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.startswith('tmp'):
+                    # still being written
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_disk_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # removed by another process
+                pass
+            size -= file_size
+
+        with self._lock:
+            self._disk_size = size
+
+    def get(self, sha):
+        """Returns the pack entry of the object sha, or None."""
+
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is not None:
+                self._entries.move_to_end(sha)
+                return entry
+        if self.directory is None:
+            return None
+
+        path = self._path(sha)
+        try:
+            with open(path, 'rb') as f:
+                entry = f.read()
+            # the modification time orders the files for _trim()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(sha, entry)
+        return entry
+
+    def put(self, sha, entry):
+        """Stores the pack entry of the object sha."""
+
+        self._remember(sha, entry)
+
+    def encode(self, obj_type, data, sha=None,
+               level=zlib.Z_DEFAULT_COMPRESSION):
+        """Returns (binary sha, pack entry) of an object.
+
+        The entry is taken from the cache if possible and encoded and
+        stored otherwise. Entries are valid whatever level they were
+        compressed with, so level only applies to new ones. Objects of
+        other types than those cached are always encoded.
+        """
+
+        if sha is None:
+            sha = hash_object(obj_type, data)
+        if obj_type not in self.types:
+            return sha, encode_entry(obj_type, data, level)
+        entry = self.get(sha)
+        if entry is not None:
+            self.hits += 1
+            instrument.count('objects_reused', 1)
+            return sha, entry
+
+        self.misses += 1
+        entry = encode_entry(obj_type, data, level)
+        self.put(sha, entry)
+        return sha, entry
+
+    def commit_factory(self, tree, author, message):
+        """Returns a CommitFactory shared by all repositories that commit
+        tree as author with message.
+
+        The MAX_FACTORIES templates used most recently are kept.
+        """
+
+        key = (tree, author, message)
+        with self._lock:
+            factory = self._factories.get(key)
+            if factory is None:
+                factory = CommitFactory(tree, author, message)
+                self._factories[key] = factory
+                if len(self._factories) > MAX_FACTORIES:
+                    self._factories.popitem(last=False)
+            else:
+                self._factories.move_to_end(key)
+            return factory
+
+    def flush(self):
+        """Writes all entries held in memory to the directory."""
+
+        if self.directory is None:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        for sha, entry in entries:
+            self._spill(sha, entry)
+
+
+class PackWriter:
+    """Writes git objects into a version 2 packfile.
+
+    If the number of objects is known in advance the pack is streamed
+    strictly sequentially, so any writable file-like object will do.
+    Otherwise f has to be seekable and readable: the object count in
+    the header is patched and the checksum computed on close().
+
+    Objects are deduplicated by SHA-1. If an ObjectCache is given,
+    objects are encoded through it.
+    """
+
+    def __init__(self, f, count=None, level=zlib.Z_DEFAULT_COMPRESSION,
+                 cache=None):
+        self._f = f
+        self._count = count
+        self._level = level
+        self._cache = cache
+        self._sha = hashlib.sha1() if count is not None else None
+        self.entries = {}
+        self.offset = 0
+        self.checksum = None
+        self._write(b'PACK' + struct.pack('>II', 2, count or 0))
+
+    def _write(self, data):
+        self._f.write(data)
+        if self._sha is not None:
+            self._sha.update(data)
+        self.offset += len(data)
+
+    def add(self, obj_type, data, sha=None):
+        """Adds an object to the pack and returns its binary SHA-1."""
+
+        if sha is None:
+            sha = hash_object(obj_type, data)
+        if sha in self.entries:
+            return sha
+        if self._cache is not None:
+            self.add_raw(
+                *self._cache.encode(obj_type, data, sha, self._level)
+            )
+        else:
+            self.add_raw(sha, encode_entry(obj_type, data, self._level))
+        return sha
+
+    def add_raw(self, sha, entry):
+        """Adds an already encoded pack entry for the object sha."""
+
+        if sha in self.entries:
+            return
+        self.entries[sha] = (self.offset, zlib.crc32(entry) & 0xffffffff)
+        self._write(entry)
+
+    def close(self):
+        """Finishes the pack and returns its binary checksum."""
+
+        if self._count is None:
+            self._f.seek(8)
+            self._f.write(struct.pack('>I', len(self.entries)))
+            self._f.seek(0)
+            sha = hashlib.sha1()
+            for chunk in iter(lambda: self._f.read(65536), b''):
+                sha.update(chunk)
+            self._sha = sha
+        elif self._count != len(self.entries):
+            raise ValueError(
+                'Expected {} objects in pack, got {}'.format(
+                    self._count, len(self.entries)
+                )
+            )
+
+        self.checksum = self._sha.digest()
+        self._f.write(self.checksum)
+        return self.checksum
+
+
+class MemoryObjectStore:
+    """Keeps encoded objects in memory until they are written as a pack.
+
+    Offers the same add() interface as PackWriter. Objects are kept in
+    insertion order and deduplicated by SHA-1. If an ObjectCache is
+    given, objects are encoded through it.
+    """
+
+    def __init__(self, level=zlib.Z_DEFAULT_COMPRESSION, cache=None):
+        self._level = level
+        self._cache = cache
+        self.objects = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, sha):
+        return sha in self.objects
+
+    def add(self, obj_type, data, sha=None):
+        """Adds an object to the store and returns its binary SHA-1."""
+
+        if sha is None:
+            sha = hash_object(obj_type, data)
+        if sha in self.objects:
+            return sha
+        if self._cache is not None:
+            self.objects[sha] = self._cache.encode(
+                obj_type, data, sha, self._level
+            )[1]
+        else:
+            self.objects[sha] = encode_entry(obj_type, data, self._level)
+        return sha
+
+    def write_pack(self, f):
+        """Streams all objects as a packfile to f.
+
+        Returns the PackWriter used, which holds the pack checksum and
+        the entries needed by write_index().
+        """
+
+        writer = PackWriter(f, count=len(self.objects))
+        for sha, entry in self.objects.items():
+            writer.add_raw(sha, entry)
+        writer.close()
+        return writer
+
+    def pack_size(self):
+        """Returns the size in bytes of the pack write_pack() writes."""
+
+        return 12 + sum(len(entry) for entry in self.objects.values()) + 20
+
+    def iter_pack(self, chunk_size=65536):
+        """Yields the pack write_pack() writes in chunks of about
+        chunk_size bytes, without holding it in memory as a whole.
+        """
+
+        buf = io.BytesIO()
+        writer = PackWriter(buf, count=len(self.objects))
+        for sha, entry in self.objects.items():
+            writer.add_raw(sha, entry)
+            if buf.tell() >= chunk_size:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        writer.close()
+        yield buf.getvalue()
+
+
+def write_index(f, entries, pack_checksum):
+    """Writes a version 2 pack index for entries of a PackWriter."""
+
+    shas = sorted(entries)
+    sha = hashlib.sha1()
+
+    def write(data):
+        f.write(data)
+        sha.update(data)
+
+    fanout = [0] * 256
+    for obj in shas:
+        fanout[obj[0]] += 1
+    total = 0
+    for i in range(256):
+        total += fanout[i]
+        fanout[i] = total
+
+    write(b'\xfftOc' + struct.pack('>I', 2))
+    write(struct.pack('>256I', *fanout))
+    write(b''.join(shas))
+    write(b''.join(struct.pack('>I', entries[obj][1]) for obj in shas))
+
+    large = []
+    offsets = []
+    for obj in shas:
+        offset = entries[obj][0]
+        if offset < 0x80000000:
+            offsets.append(struct.pack('>I', offset))
+        else:
+            offsets.append(struct.pack('>I', 0x80000000 | len(large)))
+            large.append(struct.pack('>Q', offset))
+    write(b''.join(offsets))
+    write(b''.join(large))
+
+    write(pack_checksum)
+    f.write(sha.digest())
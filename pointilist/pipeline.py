@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    asyncio pipeline that overlaps fetching graphs with filling and
+    populating repositories.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import shutil
+import tempfile
+
+from pointilist.batch import _run_worker_job, error_report, run_job
+from pointilist.graph import GITHUB_URL, Graph
+
+
+async def pipeline(jobs, seed=None, output_dir=None, base_url=GITHUB_URL,
+                   fetchers=4, workers=None, max_pending=None,
+                   executor=None, plans=None, timeout=None,
+                   object_cache=None, tempdir=None):
+    """Coroutine that runs fetch, fill and populate for many accounts.
+
+    Up to fetchers graphs are fetched concurrently on the event loop,
+    while up to workers fetched graphs are filled and populated by
+    run_job() in executor, by default a thread pool of that size. Pass
+    a ProcessPoolExecutor to use several cores for the CPU bound work.
+
+    Fetched graphs wait in a queue of at most max_pending entries (by
+    default twice the number of workers); once it is full, fetching
+    pauses until a worker is free, so memory use stays bounded however
+    many jobs there are. jobs are consumed lazily and may be usernames
+    or Graphs that already hold data.
+
+    Scratch repositories are created below a temporary directory in
+    tempdir, which is removed once all jobs are done. object_cache is
+    shared by all workers of a thread pool; with a process pool, every
+    worker process gets its own scratch directory and keeps its own
+    copy of object_cache for all of its jobs, so the copies share only
+    its directory, if any.
+
+    Returns the reports of all jobs, in the order in which they
+    completed. See run_job() for the other arguments.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    loop = asyncio.get_event_loop()
+    fetched = asyncio.Queue(maxsize=max_pending)
+    reports = []
+    jobs = iter(jobs)
+
+    async def fetch():
+        # all fetchers share the jobs iterator
+        for job in jobs:
+            if isinstance(job, Graph):
+                await fetched.put((job, None))
+                continue
+            graph = Graph(job)
+            try:
+                await graph.fetch_async(base_url, timeout)
+            except Exception as exc:  # pylint: disable=broad-except
+                await fetched.put((graph, exc))
+            else:
+                await fetched.put((graph, None))
+
+    async def work(pool):
+        while True:
+            item = await fetched.get()
+            if item is None:
+                return
+            graph, exc = item
+            if exc is not None:
+                reports.append(error_report(graph.username, exc))
+                continue
+            if isinstance(pool, concurrent.futures.ProcessPoolExecutor):
+                # worker processes set up their scratch directory and
+                # object cache with their first job
+                call = (_run_worker_job, root, object_cache, graph, seed,
+                        output_dir, base_url, plans)
+            else:
+                call = (run_job, graph, seed, output_dir, base_url, plans,
+                        object_cache, root)
+            try:
+                reports.append(await loop.run_in_executor(pool, *call))
+            except Exception as exc:  # pylint: disable=broad-except
+                reports.append(error_report(graph.username, exc))
+
+    root = tempfile.mkdtemp(prefix='pointilist-', dir=tempdir)
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+    try:
+        tasks = [
+            asyncio.ensure_future(work(executor)) for _ in range(workers)
+        ]
+        try:
+            await asyncio.gather(*[fetch() for _ in range(fetchers)])
+        finally:
+            for _ in tasks:
+                await fetched.put(None)
+            await asyncio.gather(*tasks)
+    finally:
+        if own_executor:
+            executor.shutdown()
+        shutil.rmtree(root, ignore_errors=True)
+
+    return reports
+
+
+def run_pipeline(jobs, **kwargs):
+    """Runs pipeline() on a new event loop and returns its reports."""
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(pipeline(jobs, **kwargs))
+    finally:
+        loop.close()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Pushes branches to remote repositories over git's smart HTTP
+    protocol, without a git installation.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import urllib.parse
+from urllib.error import HTTPError
+
+import certifi
+import urllib3
+
+ZERO_SHA = b'\0' * 20
+FLUSH_PKT = b'0000'
+USER_AGENT = 'pointilist'
+AGENT = b'agent=' + USER_AGENT.encode()
+
+
+def pkt_line(data):
+    """Returns data framed as a git pkt-line."""
+
+    return '{:04x}'.format(len(data) + 4).encode() + data
+
+
+def read_pkt_lines(data):
+    """Yields the payloads of the pkt-lines in data, None for flushes."""
+
+    pos = 0
+    while pos < len(data):
+        try:
+            size = int(data[pos:pos + 4], 16)
+        except ValueError:
+            raise ValueError(
+                'Invalid pkt-line: {!r}'.format(data[pos:pos + 4])
+            )
+        if size == 0:
+            yield None
+            pos += 4
+            continue
+        if size < 4 or pos + size > len(data):
+            raise ValueError('Truncated pkt-line')
+        yield data[pos + 4:pos + size]
+        pos += size
+
+
+def parse_advertisement(data):
+    """Returns the refs and capabilities a receive-pack service offers.
+
+    refs maps ref names to binary SHA-1s; capabilities is a set of
+    bytes. An empty repository advertises no refs.
+    """
+
+    lines = read_pkt_lines(data)
+    first = next(lines, None)
+    if first is None or first.rstrip(b'\n') != b'# service=git-receive-pack':
+        raise ValueError('Not a smart HTTP git-receive-pack service')
+
+    refs = {}
+    capabilities = set()
+    for line in lines:
+        if line is None:
+            continue
+        line = line.rstrip(b'\n')
+        if b'\0' in line:
+            line, caps = line.split(b'\0', 1)
+            capabilities.update(caps.split())
+        sha, _, name = line.partition(b' ')
+        if name != b'capabilities^{}':
+            refs[name.decode()] = bytes.fromhex(sha.decode())
+    return refs, capabilities
+
+
+def parse_report(data):
+    """Checks a report-status response and raises ValueError if the
+    remote did not accept the pack and every ref update.
+    """
+
+    lines = [
+        line.rstrip(b'\n').decode('utf-8', 'replace')
+        for line in read_pkt_lines(data) if line is not None
+    ]
+    if not lines or lines[0] != 'unpack ok':
+        raise ValueError('Remote failed to unpack: {}'.format(
+            lines[0] if lines else 'no report'
+        ))
+    errors = [line[3:] for line in lines[1:] if line.startswith('ng ')]
+    if errors:
+        raise ValueError('Push rejected: {}'.format('; '.join(errors)))
+
+
+class Remote:
+    """Remote repository that is pushed to over git's smart HTTP.
+
+    Credentials may be included in url or given as username and
+    password, e.g. an access token. Connections are kept alive and
+    reused by later requests and pushes until close() is called; a
+    Remote may be used as a context manager.
+    """
+
+    def __init__(self, url, username=None, password=None, timeout=None,
+                 pool=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(
+                'Unsupported URL scheme: {}'.format(parts.scheme)
+            )
+        netloc = parts.hostname
+        if parts.port:
+            netloc += ':{}'.format(parts.port)
+        self.url = urllib.parse.urlunsplit(
+            (parts.scheme, netloc, parts.path.rstrip('/'), '', '')
+        )
+
+        username = username or urllib.parse.unquote(parts.username or '')
+        password = password or urllib.parse.unquote(parts.password or '')
+        self.headers = {'User-Agent': USER_AGENT}
+        if username or password:
+            self.headers.update(urllib3.util.make_headers(
+                basic_auth='{}:{}'.format(username, password)
+            ))
+
+        if pool is None:
+            pool = urllib3.PoolManager(
+                maxsize=1,
+                cert_reqs='CERT_REQUIRED',
+                ca_certs=certifi.where()
+            )
+        self.pool = pool
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Closes all connections to the remote."""
+
+        self.pool.clear()
+
+    def _request(self, method, path, headers=None, body=None):
+        url = self.url + path
+        options = {} if self.timeout is None else {'timeout': self.timeout}
+        resp = self.pool.request(
+            method, url,
+            headers=dict(self.headers, **(headers or {})),
+            body=body,
+            **options
+        )
+        if resp.status >= 400:
+            raise HTTPError(url, resp.status, resp.reason, resp.headers, None)
+        return resp
+
+    def refs(self):
+        """Returns the refs and capabilities the remote advertises."""
+
+        resp = self._request(
+            'GET', '/info/refs?service=git-receive-pack'
+        )
+        content_type = resp.headers.get('Content-Type', '')
+        if content_type != 'application/x-git-receive-pack-advertisement':
+            raise ValueError('Not a smart HTTP git server: {}'.format(
+                self.url
+            ))
+        return parse_advertisement(resp.data)
+
+    def push(self, ref, old, new, size, pack, capabilities=None):
+        """Updates ref from old to new, sending the objects in a pack.
+
+        old is None if ref does not exist yet. pack is a callable that
+        returns the chunks of a packfile of size bytes; they are
+        streamed as the request body as they are produced, and pack is
+        called again if the request has to be resent. capabilities are
+        those returned by refs(); report-status is only requested if
+        the remote offers it.
+        """
+
+        wanted = [b'report-status', AGENT]
+        if capabilities is not None:
+            offered = {cap.split(b'=')[0] for cap in capabilities}
+            wanted = [cap for cap in wanted if cap.split(b'=')[0] in offered]
+        command = pkt_line(
+            (old or ZERO_SHA).hex().encode() + b' ' + new.hex().encode()
+            + b' ' + ref.encode() + b'\0' + b' '.join(wanted) + b'\n'
+        ) + FLUSH_PKT
+
+        resp = self._request(
+            'POST', '/git-receive-pack',
+            headers={
+                'Content-Type': 'application/x-git-receive-pack-request',
+                'Accept': 'application/x-git-receive-pack-result',
+                'Content-Length': str(len(command) + size)
+            },
+            body=_Body(command, pack)
+        )
+        if b'report-status' in wanted:
+            parse_report(resp.data)
+
+
+class _Body:
+    """Request body that restarts the pack whenever it is iterated."""
+
+    def __init__(self, command, pack):
+        self._command = command
+        self._pack = pack
+
+    def __iter__(self):
+        yield self._command
+        for chunk in self._pack():
+            yield chunk
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Compact columnar storage for contribution graph day rects.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import abc
+import collections.abc
+import datetime
+from array import array
+
+
+def date_to_ordinal(date):
+    """Converts a 'YYYY-MM-DD' string to a proleptic Gregorian ordinal."""
+
+    return datetime.date(
+        int(date[0:4]), int(date[5:7]), int(date[8:10])
+    ).toordinal()
+
+
+def ordinal_to_date(ordinal):
+    """Converts a proleptic Gregorian ordinal to a 'YYYY-MM-DD' string."""
+
+    return datetime.date.fromordinal(ordinal).isoformat()
+
+
+def iter_records(commits):
+    """Yields (date ordinal, count) records of a commit plan.
+
+    commits may be a CommitArray, or any iterable of {'date', 'count'}
+    dicts or of (date, count) tuples, with dates given as 'YYYY-MM-DD'
+    strings or as ordinals. Iterables are consumed lazily.
+    """
+
+    if isinstance(commits, CommitArray):
+        for record in zip(commits.dates, commits.counts):
+            yield record
+        return
+
+    for commit in commits:
+        if isinstance(commit, dict):
+            date, count = commit['date'], commit['count']
+        else:
+            date, count = commit
+        if isinstance(date, str):
+            date = date_to_ordinal(date)
+        yield date, count
+
+
+class _ColumnarSequence(collections.abc.Sequence):
+    """Base class for sequences of records stored column by column.
+
+    Subclasses keep their data in typed arrays and build a dict per
+    record only when it is accessed.
+    """
+
+    @abc.abstractmethod
+    def _row(self, idx):
+        """Returns the record at index idx as a dict."""
+
+    @abc.abstractmethod
+    def _columns(self):
+        """Returns a tuple of the columns, as compared by __eq__()."""
+
+    @abc.abstractmethod
+    def __len__(self):
+        pass
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._row(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('index out of range')
+        return self._row(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self._row(idx)
+
+    def __eq__(self, other):
+        if isinstance(other, type(self)):
+            return self._columns() == other._columns()
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, list(self))
+
+
+class RectArray(_ColumnarSequence):
+    """Columnar sequence of day rects.
+
+    Every day is stored as one entry in each of a set of typed arrays:
+    the date as an int ordinal, the commit count, the x and y position
+    and the fill as an index into a small palette of interned colors.
+
+    Indexing and iterating yields the same dicts that used to be stored
+    in Graph.data['rects'], built on demand, so existing consumers keep
+    working while only the arrays are kept in memory.
+    """
+
+    def __init__(self):
+        self.dates = array('i')
+        self.counts = array('i')
+        self.fills = array('B')
+        self.x = array('i')
+        self.y = array('i')
+        self.palette = []
+        self._palette_index = {}
+
+    @classmethod
+    def from_dicts(cls, rects):
+        """Creates a RectArray from an iterable of rect dicts."""
+
+        if isinstance(rects, cls):
+            return rects
+
+        result = cls()
+        for rect in rects:
+            result.append(
+                rect['date'], rect['count'], rect['fill'], rect['x'], rect['y']
+            )
+        return result
+
+    def _intern_fill(self, fill):
+        try:
+            return self._palette_index[fill]
+        except KeyError:
+            idx = len(self.palette)
+            self.palette.append(fill)
+            self._palette_index[fill] = idx
+            return idx
+
+    def append(self, date, count, fill, x, y):
+        """Appends a single day; date may be a string or an ordinal."""
+
+        if isinstance(date, str):
+            date = date_to_ordinal(date)
+        self.dates.append(date)
+        self.counts.append(count)
+        self.fills.append(self._intern_fill(fill))
+        self.x.append(x)
+        self.y.append(y)
+
+    def date(self, idx):
+        """Returns the date of the rect at idx as a 'YYYY-MM-DD' string."""
+
+        return ordinal_to_date(self.dates[idx])
+
+    def fill(self, idx):
+        """Returns the fill color of the rect at idx."""
+
+        return self.palette[self.fills[idx]]
+
+    def _row(self, idx):
+        return {
+            'date': self.date(idx),
+            'count': self.counts[idx],
+            'fill': self.fill(idx),
+            'x': self.x[idx],
+            'y': self.y[idx]
+        }
+
+    def _columns(self):
+        return (
+            self.dates, self.counts, self.x, self.y,
+            [self.palette[f] for f in self.fills]
+        )
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class CommitArray(_ColumnarSequence):
+    """Columnar sequence of planned commits.
+
+    Holds a date ordinal and a commit count per day. Indexing and
+    iterating yields {'date': 'YYYY-MM-DD', 'count': n} dicts.
+    """
+
+    def __init__(self, dates=None, counts=None):
+        self.dates = array('i', dates if dates is not None else [])
+        self.counts = array('i', counts if counts is not None else [])
+        if len(self.dates) != len(self.counts):
+            raise ValueError(
+                'Column length mismatch: {} dates, {} counts'.format(
+                    len(self.dates), len(self.counts)
+                )
+            )
+
+    @classmethod
+    def from_dicts(cls, commits):
+        """Creates a CommitArray from an iterable of commit dicts."""
+
+        if isinstance(commits, cls):
+            return commits
+
+        result = cls()
+        for commit in commits:
+            result.append(commit['date'], commit['count'])
+        return result
+
+    def append(self, date, count):
+        """Appends a single day; date may be a string or an ordinal."""
+
+        if isinstance(date, str):
+            date = date_to_ordinal(date)
+        self.dates.append(date)
+        self.counts.append(count)
+
+    def date(self, idx):
+        """Returns the date of the commit at idx as a 'YYYY-MM-DD' string."""
+
+        return ordinal_to_date(self.dates[idx])
+
+    def _row(self, idx):
+        return {'date': self.date(idx), 'count': self.counts[idx]}
+
+    def _columns(self):
+        return (self.dates, self.counts)
+
+    def __len__(self):
+        return len(self.counts)
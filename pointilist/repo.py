@@ -9,31 +9,331 @@
     :license: MIT, see LICENSE for details.
 """
 
+import collections.abc
+import datetime
+import itertools
 import logging
+import os
 import shutil
 import tempfile
 
+from pointilist import instrument, pack
+from pointilist.rects import iter_records, ordinal_to_date
+from pointilist.store import DiskObjectStore
+
+DEFAULT_AUTHOR = 'pointilist <pointilist@users.noreply.github.com>'
+DEFAULT_BRANCH = 'master'
+FILE_NAME = b'pointilist'
+FILE_CONTENT = b'pointilist\n'
+COMMIT_MESSAGE = b'pointilist\n'
+
+# commits are placed at noon UTC so they count for the same day
+# in every time zone github may display the calendar in
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+DAY_OFFSET = 12 * 3600
+
 
 class Repo:
-    """Object that represents an actual git repository."""
+    """Object that represents an actual git repository.
+
+    By default the repository is created as a bare repository in a
+    temporary directory. With in_memory=True no directory is created;
+    all objects are kept in memory and can be serialized as a pack
+    with write_pack().
 
-    def __init__(self, commits, tempdir=None):
+    If path is given, the bare repository at path is used instead and
+    kept after use; it is created if necessary. Only days after the
+    latest commit already on the branch are added, so the new pack
+    holds just the new objects. Combined with in_memory=True, path is
+    only read and the new objects stay in memory.
+
+    object_cache is an optional pack.ObjectCache shared with other
+    repositories; the blob, tree and commit template found there are
+    not built again.
+    """
+
+    def __init__(self, commits, tempdir=None, author=DEFAULT_AUTHOR,
+                 branch=DEFAULT_BRANCH, in_memory=False, path=None,
+                 object_cache=None):
         self.commits = commits
-        self.tempdir = tempfile.mkdtemp(dir=tempdir)
+        self.in_memory = in_memory
+        self.tempdir = None
+        if path is None and not in_memory:
+            self.tempdir = tempfile.mkdtemp(dir=tempdir)
+            path = self.tempdir
+        self.path = path
+        self.object_cache = object_cache
+        self.objects = pack.MemoryObjectStore(cache=object_cache) \
+            if in_memory else None
+        self.author = author.encode()
+        self.branch = branch
+        self.head = None
+        self.base = None
+        self.written = 0
+        self._pack_path = None
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        shutil.rmtree(self.tempdir)
+        if self.tempdir is not None:
+            shutil.rmtree(self.tempdir)
+
+    def _ref_name(self):
+        return 'refs/heads/' + self.branch
+
+    def _init_layout(self):
+        """Creates the skeleton of a bare repository in path."""
+
+        for path in ['objects/pack', 'objects/info', 'refs/heads']:
+            os.makedirs(os.path.join(self.path, path), exist_ok=True)
+        if os.path.exists(os.path.join(self.path, 'HEAD')):
+            return
+        with open(os.path.join(self.path, 'HEAD'), 'w') as f:
+            f.write('ref: {}\n'.format(self._ref_name()))
+        with open(os.path.join(self.path, 'config'), 'w') as f:
+            f.write(
+                '[core]\n'
+                '\trepositoryformatversion = 0\n'
+                '\tfilemode = true\n'
+                '\tbare = true\n'
+            )
+
+    @staticmethod
+    def _timestamps(records):
+        """Yields one commit timestamp per planned commit."""
+
+        for date, count in records:
+            base = (date - EPOCH_ORDINAL) * 86400 + DAY_OFFSET
+            for n in range(count):
+                yield base + n % DAY_OFFSET
+
+    def _records(self, latest):
+        """Returns the planned (date, count) records in date order.
+
+        In-memory plans are sorted; any other iterable is consumed
+        lazily and has to be in ascending date order already. Only days
+        with commits after latest are included.
+        """
+
+        if isinstance(self.commits, collections.abc.Sequence):
+            records = iter(sorted(
+                iter_records(self.commits), key=lambda r: r[0]
+            ))
+        else:
+            records = _ascending(iter_records(self.commits))
+
+        return (
+            (date, count) for date, count in records
+            if count > 0 and (latest is None or date > latest)
+        )
+
+    def _latest_commit(self, store):
+        """Returns the branch head and the ordinal of its day, if any."""
+
+        if store is None:
+            return None, None
+        head = store.ref(self._ref_name())
+        if head is None:
+            return None, None
+
+        obj_type, data = store.read(head)
+        if obj_type != pack.OBJ_COMMIT:
+            raise ValueError('{} is not a commit'.format(self._ref_name()))
+        for line in data.split(b'\n'):
+            if line.startswith(b'committer '):
+                timestamp = int(line.rsplit(b' ', 2)[1])
+                return head, timestamp // 86400 + EPOCH_ORDINAL
+
+        raise ValueError('Commit {} has no committer'.format(head.hex()))
+
+    def _write_objects(self, writer, records, parent=None, store=None):
+        # all commits share the same file state, so the blob and tree
+        # are built only once, and not at all if they already exist
+        blob_data = FILE_CONTENT
+        blob = pack.hash_object(pack.OBJ_BLOB, blob_data)
+        tree_data = pack.serialize_tree([(b'100644', FILE_NAME, blob)])
+        tree = pack.hash_object(pack.OBJ_TREE, tree_data)
+        objects = 0
+        if store is None or not store.contains(tree):
+            writer.add(pack.OBJ_BLOB, blob_data, blob)
+            writer.add(pack.OBJ_TREE, tree_data, tree)
+            objects = 2
+        if self.object_cache is not None:
+            factory = self.object_cache.commit_factory(
+                tree, self.author, COMMIT_MESSAGE
+            )
+        else:
+            factory = pack.CommitFactory(tree, self.author, COMMIT_MESSAGE)
+
+        commits = 0
+        for timestamp in self._timestamps(records):
+            sha, data = factory.commit(parent, timestamp)
+            parent = writer.add(pack.OBJ_COMMIT, data, sha)
+            commits += 1
+
+        self.written = commits
+        instrument.count('commits_written', commits)
+        instrument.count('objects_written', objects + commits)
+        return parent
+
+    def _write_pack(self, records, parent, store):
+        """Writes all new objects into a single pack plus index."""
+
+        pack_dir = os.path.join(self.path, 'objects', 'pack')
+        # named like git's own temporary packs, which it never reads
+        fd, tmp = tempfile.mkstemp(dir=pack_dir, prefix='tmp_pack_')
+        try:
+            with os.fdopen(fd, 'w+b') as f:
+                writer = pack.PackWriter(f, cache=self.object_cache)
+                head = self._write_objects(writer, records, parent, store)
+                checksum = writer.close()
+
+            basename = os.path.join(pack_dir, 'pack-' + checksum.hex())
+            with open(basename + '.idx', 'wb') as f:
+                pack.write_index(f, writer.entries, checksum)
+            os.replace(tmp, basename + '.pack')
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._pack_path = basename + '.pack'
+
+        return head
+
+    def _update_ref(self, head):
+        ref = os.path.join(self.path, self._ref_name())
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ref))
+        with os.fdopen(fd, 'w') as f:
+            f.write(head.hex() + '\n')
+        os.replace(tmp, ref)
 
     def populate(self):
-        """Populates the repository with fake commits."""
+        """Populates the repository with fake commits.
 
+        The commit plan is consumed record by record while the objects
+        are written, see _records() for the accepted forms. Afterwards,
+        written is the number of commits that were added.
+        """
+
+        self.written = 0
         if not self.commits:
             logging.warning('Commit data missing.')
             return
 
-        if not [True for c in self.commits if c['count'] > 0]:
+        store = None
+        if self.path is not None and os.path.isdir(self.path):
+            store = DiskObjectStore(self.path)
+        self.base, latest = self._latest_commit(store)
+        self.head = self.base
+
+        records = self._records(latest)
+        first = next(records, None)
+        if first is None:
             logging.warning('Nothing to commit.')
             return
+        records = itertools.chain([first], records)
+
+        with instrument.span('write'):
+            if self.in_memory:
+                self.head = self._write_objects(
+                    self.objects, records, self.base, store
+                )
+                return
+
+            self._init_layout()
+            self.head = self._write_pack(records, self.base, store)
+            self._update_ref(self.head)
+
+    def write_pack(self, f):
+        """Writes the objects created by populate() as a packfile to f.
+
+        Returns the binary pack checksum.
+        """
+
+        if (self.in_memory and not self.objects) \
+                or (not self.in_memory and self._pack_path is None):
+            raise ValueError(
+                'Repository empty; maybe you need to call populate() first?'
+            )
+
+        if self.in_memory:
+            return self.objects.write_pack(f).checksum
+
+        with open(self._pack_path, 'rb') as src:
+            shutil.copyfileobj(src, f)
+        return bytes.fromhex(
+            os.path.basename(self._pack_path)[len('pack-'):-len('.pack')]
+        )
+
+    def _pack_source(self):
+        """Returns the size of the new pack and a callable yielding it."""
+
+        if self.in_memory:
+            return self.objects.pack_size(), self.objects.iter_pack
+
+        path = self._pack_path
+
+        def chunks():
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(65536), b''):
+                    yield chunk
+
+        return os.path.getsize(path), chunks
+
+    def push(self, remote, force=False):
+        """Pushes the branch to a remote over git's smart HTTP protocol.
+
+        remote is a pointilist.push.Remote, whose connection is kept
+        alive for later pushes, or a URL. The pack created by populate()
+        is streamed to the remote while it is read. The remote branch
+        has to be at the commit the new commits were added to, or be
+        missing if they start a new history. force only allows a new
+        history to replace a remote branch; the pack of commits added to
+        an existing branch lacks the objects the remote would need.
+        Returns False if the remote branch was up to date already.
+        """
+
+        from pointilist.push import Remote
+
+        if self.head is None:
+            raise ValueError(
+                'Repository empty; maybe you need to call populate() first?'
+            )
+        if not isinstance(remote, Remote):
+            with Remote(remote) as remote:
+                return self.push(remote, force)
+
+        ref = self._ref_name()
+        refs, capabilities = remote.refs()
+        old = refs.get(ref)
+        if old == self.head:
+            return False
+        if old != self.base and (self.base is not None or not force):
+            raise ValueError('Remote {} is at {}, expected {}'.format(
+                ref, old.hex() if old else 'nothing',
+                self.base.hex() if self.base else 'nothing'
+            ))
+        if self.head == self.base:
+            raise ValueError('No new commits to push to {}'.format(ref))
+
+        size, pack_chunks = self._pack_source()
+        with instrument.span('push'):
+            remote.push(ref, old, self.head, size, pack_chunks, capabilities)
+        instrument.count('bytes_pushed', size)
+        return True
+
+
+def _ascending(records):
+    """Passes records through, making sure their dates do not decrease."""
+
+    previous = None
+    for date, count in records:
+        if previous is not None and date < previous:
+            raise ValueError(
+                'Commit plan not in date order: {} after {}'.format(
+                    ordinal_to_date(date), ordinal_to_date(previous)
+                )
+            )
+        previous = date
+        yield date, count
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Rate limited fetching of contribution graphs.
+
+    The FetchScheduler spaces out requests with a token bucket per
+    host, retries throttled and failed requests with jittered
+    exponential backoff, honoring Retry-After, and refreshes the
+    stalest graphs first.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import concurrent.futures
+import email.utils
+import heapq
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from urllib.error import HTTPError
+
+import urllib3
+
+from pointilist.fetch import fetch_graph, make_pool
+from pointilist.futures import as_completed
+from pointilist.graph import GITHUB_URL, Graph
+
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+MAX_REDIRECTS = 5
+
+
+class TokenBucket:
+    """Allows bursts of up to burst requests and rate requests per second
+    on average.
+
+    Thread-safe; clock returns the current time in seconds.
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError('Invalid rate limit: {}/s, burst {}'.format(
+                rate, burst
+            ))
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = self._updated
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns the seconds to wait before using it.
+
+        Tokens may be reserved ahead of time; callers queue up behind
+        each other at the configured rate.
+        """
+
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds):
+        """Holds back all requests for seconds, e.g. after a 429."""
+
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, self._clock() + seconds
+            )
+
+
+def retry_after(value, now=None):
+    """Returns the delay in seconds requested by a Retry-After header.
+
+    value may be a number of seconds or an HTTP date. Returns None if
+    it is missing or invalid.
+    """
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    if now is None:
+        now = time.time()
+    return max(0.0, date.timestamp() - now)
+
+
+class FetchScheduler:
+    """Fetches contribution graphs while respecting rate limits.
+
+    Requests to each host are limited to rate per second, with bursts of
+    up to burst requests. Responses with a status in RETRY_STATUS,
+    timeouts and connection errors are retried up to retries times;
+    the delay is taken from the Retry-After header if there is one and
+    is otherwise drawn uniformly from [0, backoff * 2 ** attempt],
+    capped at max_backoff. A Retry-After on a 429 also pauses all
+    other requests to that host.
+
+    Each request may take up to timeout seconds to connect and between
+    received chunks. If a GraphCache is given, graphs are refreshed
+    through it and the ones fetched longest ago go first; fresh entries
+    are reused without taking a token.
+    """
+
+    def __init__(self, rate=1.0, burst=4, concurrency=4, retries=5,
+                 backoff=0.5, max_backoff=60.0, timeout=10.0,
+                 base_url=GITHUB_URL, cache=None, pool=None, rng=None,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.base_url = base_url
+        self.cache = cache
+        if pool is None:
+            # retries are handled here, redirects by urllib3
+            pool = make_pool(concurrency, retries=urllib3.Retry(
+                total=None, connect=0, read=0, other=0, status=0,
+                redirect=MAX_REDIRECTS, respect_retry_after_header=False
+            ))
+        self.pool = pool
+        self._rng = random.Random() if rng is None else rng
+        self._sleep = sleep
+        self._clock = clock
+        self._buckets = {}
+        self._queue = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        """Returns the TokenBucket limiting requests to host."""
+
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(
+                    self.rate, self.burst, self._clock
+                )
+            return self._buckets[host]
+
+    def submit(self, username, priority=None, base_url=None):
+        """Queues the graph of username to be fetched.
+
+        Lower priorities are fetched first. By default the priority is
+        the time the cached graph was fetched, or 0 if there is none.
+        """
+
+        if priority is None:
+            priority = 0.0
+            if self.cache is not None:
+                entry = self.cache.get(username)
+                if entry is not None:
+                    priority = entry['fetched']
+        with self._lock:
+            heapq.heappush(self._queue, (
+                priority, self._count, username, base_url or self.base_url
+            ))
+            self._count += 1
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _pop(self):
+        with self._lock:
+            if not self._queue:
+                return None
+            return heapq.heappop(self._queue)
+
+    def _delay(self, attempt, exc):
+        """Returns the delay before retrying after exc, or None."""
+
+        if isinstance(exc, HTTPError):
+            if exc.code not in RETRY_STATUS:
+                return None
+            delay = retry_after(exc.headers.get('Retry-After'))
+            if delay is not None:
+                return delay
+        elif not isinstance(exc, (urllib3.exceptions.HTTPError, OSError)):
+            return None
+        return self._rng.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** attempt)
+        )
+
+    def fetch(self, graph, base_url=None):
+        """Retrieves contribution data for graph, retrying as needed.
+
+        A fresh cached graph is reused without taking a token.
+        """
+
+        base_url = base_url or self.base_url
+        if self.cache is not None:
+            entry = self.cache.get(graph.username)
+            if entry is not None and self.cache.fresh(entry):
+                graph.data = entry['data']
+                return graph
+
+        bucket = self.bucket(urllib.parse.urlsplit(base_url).netloc)
+        attempt = 0
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                self._sleep(wait)
+            try:
+                return fetch_graph(
+                    graph, self.pool, base_url, self.cache, self.timeout
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                delay = self._delay(attempt, exc)
+                if delay is None or attempt >= self.retries:
+                    raise
+                if isinstance(exc, HTTPError) and exc.code == 429:
+                    bucket.pause(delay)
+                logging.info(
+                    'Retrying %s in %.2fs: %s', graph.username, delay, exc
+                )
+                attempt += 1
+                self._sleep(delay)
+
+    def _next_task(self):
+        item = self._pop()
+        if item is None:
+            return None
+        _, _, username, base_url = item
+        graph = Graph(username)
+        return graph, self.fetch, (graph, base_url)
+
+    def run(self):
+        """Fetches all queued graphs.
+
+        Yields (graph, error) tuples like fetch_many(), in the order in
+        which the fetches complete. Graphs submitted while iterating are
+        fetched as well.
+        """
+
+        with concurrent.futures.ThreadPoolExecutor(
+                self.concurrency) as executor:
+            for graph, future in as_completed(
+                    executor, self._next_task, self.concurrency):
+                yield graph, future.exception()
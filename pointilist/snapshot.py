@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Binary snapshots of parsed contribution graphs.
+
+    A snapshot consists of a fixed header, a small JSON block holding
+    the username, the fill palette and the month and weekday labels,
+    and the day records. The fixed-width fields of the days are stored
+    column by column, in the same layout RectArray keeps in memory:
+
+        header   magic, version, reserved, days, metadata size
+                 ('<4sHHII')
+        metadata JSON, zero-padded to a multiple of 4 bytes
+        days     date ordinals, counts, x and y as int32 each,
+                 followed by fill palette indexes as uint8
+
+    Snapshots are read with a single readinto(); the day columns are
+    copied into arrays as they are, without parsing, and no file stays
+    open once a snapshot was loaded.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from pointilist.rects import RectArray
+
+SNAPSHOT_MAGIC = b'PNTL'
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct('<4sHHII')
+_INT_COLUMNS = ['dates', 'counts', 'x', 'y']
+
+
+def _padded(size):
+    return (size + 3) & ~3
+
+
+def _little_endian(column, typecode):
+    if sys.byteorder == 'little':
+        return column
+    column = array(typecode, column)
+    column.byteswap()
+    return column
+
+
+def write(f, username, data):
+    """Writes graph data as a snapshot to the binary file f."""
+
+    rects = RectArray.from_dicts(data['rects'])
+    meta = json.dumps({
+        'username': username,
+        'palette': rects.palette,
+        'months': data['months'],
+        'wdays': data['wdays']
+    }).encode()
+
+    f.write(_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(rects), len(meta)
+    ))
+    f.write(meta + b'\0' * (_padded(len(meta)) - len(meta)))
+    for name in _INT_COLUMNS:
+        f.write(_little_endian(getattr(rects, name), 'i'))
+    f.write(rects.fills)
+
+
+def save(path, username, data):
+    """Writes a snapshot to path, replacing it atomically."""
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f, username, data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def _column(view, typecode):
+    column = array(typecode)
+    column.frombytes(view)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def load(path):
+    """Reads the snapshot at path and returns (username, data)."""
+
+    with open(path, 'rb') as f:
+        buf = bytearray(os.fstat(f.fileno()).st_size)
+        size = f.readinto(buf)
+    if size < _HEADER.size:
+        raise ValueError('Truncated snapshot: {}'.format(path))
+    view = memoryview(buf)[:size]
+
+    magic, version, _, days, meta_size = _HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError('Not a graph snapshot: {}'.format(path))
+    if version != SNAPSHOT_VERSION:
+        raise ValueError('Unsupported snapshot version: {}'.format(version))
+
+    pos = _HEADER.size
+    if size != pos + _padded(meta_size) + 17 * days:
+        raise ValueError('Truncated snapshot: {}'.format(path))
+    meta = json.loads(bytes(view[pos:pos + meta_size]).decode())
+    pos += _padded(meta_size)
+
+    rects = RectArray()
+    for name in _INT_COLUMNS:
+        setattr(rects, name, _column(view[pos:pos + 4 * days], 'i'))
+        pos += 4 * days
+    rects.fills = _column(view[pos:pos + days], 'B')
+    for fill in meta['palette']:
+        rects._intern_fill(fill)
+
+    return meta['username'], {
+        'rects': rects,
+        'months': meta['months'],
+        'wdays': meta['wdays']
+    }
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Reads objects and refs from an existing git repository.
+
+    :copyright: © 2018, tickelton <tickelton@gmail.com>.
+    :license: MIT, see LICENSE for details.
+"""
+
+import glob
+import os
+import struct
+import zlib
+
+from pointilist import pack
+
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NUMBERS = {name: num for num, name in pack.TYPE_NAMES.items()}
+
+_IDX_HEADER = b'\xfftOc\0\0\0\2'
+_IDX_TABLES = 8 + 256 * 4
+
+
+def _varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def apply_delta(base, delta):
+    """Reconstructs an object from its base and a git delta."""
+
+    src_size, pos = _varint(delta, 0)
+    if src_size != len(base):
+        raise ValueError(
+            'Delta base size mismatch: {} != {}'.format(src_size, len(base))
+        )
+    dst_size, pos = _varint(delta, pos)
+
+    out = bytearray()
+    while pos < len(delta):
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            out += base[offset:offset + (size or 0x10000)]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError('Invalid delta opcode 0')
+
+    if len(out) != dst_size:
+        raise ValueError(
+            'Delta result size mismatch: {} != {}'.format(len(out), dst_size)
+        )
+    return bytes(out)
+
+
+class _PackIndex:
+    """Lookup of object offsets in a version 2 pack index."""
+
+    def __init__(self, data):
+        if data[:8] != _IDX_HEADER:
+            raise ValueError('Unsupported pack index format')
+        self._data = data
+        self._fanout = struct.unpack_from('>256I', data, 8)
+        self._count = self._fanout[255]
+
+    def _sha(self, i):
+        start = _IDX_TABLES + 20 * i
+        return self._data[start:start + 20]
+
+    def offset(self, sha):
+        """Returns the pack offset of sha, or None."""
+
+        lo = self._fanout[sha[0] - 1] if sha[0] else 0
+        hi = self._fanout[sha[0]]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            other = self._sha(mid)
+            if other < sha:
+                lo = mid + 1
+            elif other > sha:
+                hi = mid
+            else:
+                break
+        else:
+            return None
+
+        tables = _IDX_TABLES + 24 * self._count
+        offset, = struct.unpack_from('>I', self._data, tables + 4 * mid)
+        if offset & 0x80000000:
+            offset, = struct.unpack_from(
+                '>Q', self._data,
+                tables + 4 * self._count + 8 * (offset & 0x7fffffff)
+            )
+        return offset
+
+
+class DiskObjectStore:
+    """Read access to the objects and refs of a repository on disk.
+
+    path is the git directory, i.e. a bare repository or the .git
+    directory of a working tree. Both loose objects and version 2
+    packs, including deltified entries, are supported.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._packs = None
+
+    def _pack_indexes(self):
+        if self._packs is None:
+            self._packs = []
+            pattern = os.path.join(self.path, 'objects', 'pack', '*.idx')
+            for idx_path in sorted(glob.glob(pattern)):
+                pack_path = idx_path[:-len('.idx')] + '.pack'
+                if not os.path.exists(pack_path):
+                    continue
+                with open(idx_path, 'rb') as f:
+                    self._packs.append((_PackIndex(f.read()), pack_path))
+        return self._packs
+
+    def _loose_path(self, sha):
+        name = sha.hex()
+        return os.path.join(self.path, 'objects', name[:2], name[2:])
+
+    def _locate(self, sha):
+        for index, pack_path in self._pack_indexes():
+            offset = index.offset(sha)
+            if offset is not None:
+                return pack_path, offset
+        return None
+
+    def contains(self, sha):
+        """Returns True if the object sha exists in the repository."""
+
+        return (
+            os.path.exists(self._loose_path(sha))
+            or self._locate(sha) is not None
+        )
+
+    def read(self, sha):
+        """Returns (type, data) of the object sha."""
+
+        try:
+            with open(self._loose_path(sha), 'rb') as f:
+                raw = zlib.decompress(f.read())
+        except FileNotFoundError:
+            pass
+        else:
+            header, data = raw.split(b'\0', 1)
+            return TYPE_NUMBERS[header.split(b' ')[0]], data
+
+        location = self._locate(sha)
+        if location is None:
+            raise KeyError(sha.hex())
+        with open(location[0], 'rb') as f:
+            return self._read_packed(f, location[1])
+
+    def _read_packed(self, f, offset):
+        f.seek(offset)
+        byte = f.read(1)[0]
+        obj_type = (byte >> 4) & 0x07
+        while byte & 0x80:
+            byte = f.read(1)[0]
+
+        base_offset = base_sha = None
+        if obj_type == OBJ_OFS_DELTA:
+            byte = f.read(1)[0]
+            distance = byte & 0x7f
+            while byte & 0x80:
+                byte = f.read(1)[0]
+                distance = ((distance + 1) << 7) | (byte & 0x7f)
+            base_offset = offset - distance
+        elif obj_type == OBJ_REF_DELTA:
+            base_sha = f.read(20)
+
+        decompressor = zlib.decompressobj()
+        data = []
+        while not decompressor.eof:
+            chunk = f.read(4096)
+            if not chunk:
+                raise ValueError('Truncated pack entry at {}'.format(offset))
+            data.append(decompressor.decompress(chunk))
+        data = b''.join(data)
+
+        if base_offset is not None:
+            base = self._read_packed(f, base_offset)
+        elif base_sha is not None:
+            base = self.read(base_sha)
+        else:
+            return obj_type, data
+        return base[0], apply_delta(base[1], data)
+
+    def ref(self, name):
+        """Returns the binary sha a ref points to, or None."""
+
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return bytes.fromhex(f.read().strip())
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(os.path.join(self.path, 'packed-refs')) as f:
+                for line in f:
+                    if line.startswith(('#', '^')):
+                        continue
+                    sha, ref = line.split()
+                    if ref == name:
+                        return bytes.fromhex(sha)
+        except FileNotFoundError:
+            pass
+
+        return None
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Local HTTP server standing in for github in tests.
+"""
+
+import email.utils
+import hashlib
+import os
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+STATIC_DIR = os.path.dirname(os.path.realpath(__file__)) \
+        + '/static/'
+
+USERS = {
+    '200': STATIC_DIR + 'contributions.html',
+    'garbage': STATIC_DIR + 'hello_world.html',
+    'short': STATIC_DIR + 'contributions_short.html',
+    'class': STATIC_DIR + 'contributions_wrong_class.html'
+}
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server handling each connection in a daemon thread."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients hang up early, e.g. once the calendar was read
+        if isinstance(sys.exc_info()[1],
+                      (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.fixture.lock:
+            self.server.fixture.connections += 1
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        with fixture.lock:
+            fixture.requests.append((self.path, dict(self.headers)))
+        status, headers, body = fixture.respond(self.path, self.headers)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureServer:
+    """Serves the static fixtures at /users/<name>/contributions.
+
+    Responses carry ETag and Last-Modified validators and matching
+    conditional requests are answered with 304. Records every request
+    and counts the accepted connections. Override respond() to customize
+    responses.
+    """
+
+    def __init__(self, users=None):
+        self.users = dict(USERS if users is None else users)
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingServer(('127.0.0.1', 0), _Handler)
+        self._httpd.fixture = self
+        self.base_url = 'http://127.0.0.1:{}'.format(
+            self._httpd.server_address[1]
+        )
+        self._thread = None
+
+    def respond(self, path, headers):
+        """Returns (status, headers, body) for a request."""
+
+        parts = path.split('/')
+        if len(parts) == 4 and parts[1] == 'users' \
+                and parts[3] == 'contributions' and parts[2] in self.users:
+            path = self.users[parts[2]]
+            with open(path, 'rb') as f:
+                body = f.read()
+            validators = {
+                'ETag': '"{}"'.format(hashlib.sha1(body).hexdigest()),
+                'Last-Modified': email.utils.formatdate(
+                    os.path.getmtime(path), usegmt=True
+                )
+            }
+            if headers.get('If-None-Match') == validators['ETag']:
+                return 304, validators, b''
+            validators['Content-Type'] = 'text/html'
+            return 200, validators, body
+
+        return 404, {}, b'Not Found'
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Local smart HTTP git server standing in for github in tests.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import dulwich.repo
+from dulwich.server import DictBackend
+from dulwich.web import make_wsgi_chain
+
+from fixture_server import ThreadingServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.git.lock:
+            self.server.git.connections += 1
+
+    def _run_app(self):
+        git = self.server.git
+        path, _, query = self.path.partition('?')
+        with git.lock:
+            git.requests.append((self.command, path, dict(self.headers)))
+
+        environ = {
+            'REQUEST_METHOD': self.command,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': self.headers.get('Content-Length', ''),
+            'SERVER_NAME': '127.0.0.1',
+            'SERVER_PORT': str(self.server.server_address[1]),
+            'SERVER_PROTOCOL': self.request_version,
+            'wsgi.input': self.rfile,
+            'wsgi.url_scheme': 'http'
+        }
+        for name, value in self.headers.items():
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ.setdefault(key, value)
+
+        status = []
+        body = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status[:] = [status_line, headers]
+            return body.append
+
+        result = git.app(environ, start_response)
+        try:
+            for data in result:
+                body.append(data)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        # answer with a Content-Length so the connection stays open
+        body = b''.join(body)
+        code, _, reason = status[0].partition(' ')
+        self.send_response(int(code), reason)
+        for name, value in status[1]:
+            if name.lower() not in ('content-length', 'transfer-encoding'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _run_app
+    do_POST = _run_app
+
+    def log_message(self, *args):
+        pass
+
+
+class GitServer:
+    """Serves the bare repository at path over git's smart HTTP.
+
+    The repository is available at base_url. Requests are answered by
+    dulwich over keep-alive connections. Records every request and
+    counts the accepted connections.
+    """
+
+    def __init__(self, path):
+        self.repo = dulwich.repo.Repo(path)
+        self.app = make_wsgi_chain(DictBackend({'/': self.repo}))
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingServer(('127.0.0.1', 0), _Handler)
+        self._httpd.git = self
+        self.base_url = 'http://127.0.0.1:{}'.format(
+            self._httpd.server_address[1]
+        )
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05}
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self.repo.close()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.batch.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import dulwich.repo
+
+from pointilist import batch, cache, graph, pack
+
+from fixture_server import FixtureServer, USERS
+
+
+class TestRunBatch(unittest.TestCase):
+    """Tests for the run_batch() function."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.dir.cleanup()
+
+    def test_run_batch(self):
+        """Check reports for fetched, snapshot and failing jobs."""
+
+        snapshot = graph.Graph('snapshot')
+        with open(USERS['200'], 'r') as f:
+            snapshot._parse_graph_data(f.read())
+
+        scratch = os.path.join(self.dir.name, 'scratch')
+        output = os.path.join(self.dir.name, 'output')
+        os.mkdir(scratch)
+
+        reports = {
+            report['username']: report
+            for report in batch.run_batch(
+                ['200', '404', 'short', snapshot], workers=2, seed=1,
+                tempdir=scratch, output_dir=output,
+                base_url=self.server.base_url
+            )
+        }
+
+        self.assertEqual(
+            sorted(reports), ['200', '404', 'short', 'snapshot']
+        )
+        for name in ['200', 'snapshot']:
+            self.assertIsNone(reports[name]['error'])
+            self.assertGreater(reports[name]['commits'], 0)
+            path = os.path.join(output, name + '.git')
+            with dulwich.repo.Repo(path) as d:
+                self.assertEqual(d.head().decode(), reports[name]['head'])
+                self.assertEqual(
+                    len(list(d.get_walker())), reports[name]['commits']
+                )
+        self.assertTrue(reports['404']['error'].startswith('HTTPError'))
+        self.assertEqual(
+            reports['short']['error'],
+            'ValueError: Too few data points in graph: 14 < 365'
+        )
+        self.assertEqual(os.listdir(scratch), [])
+
+    def test_run_batch_object_cache(self):
+        """Check that workers share the disk tier of an object cache."""
+
+        objects = os.path.join(self.dir.name, 'objects')
+        object_cache = pack.ObjectCache(max_size=0, directory=objects)
+        reports = list(batch.run_batch(
+            ['200', '200'], workers=2, seed=1,
+            base_url=self.server.base_url, object_cache=object_cache
+        ))
+
+        self.assertTrue(all(r['error'] is None for r in reports))
+        self.assertEqual(reports[0]['head'], reports[1]['head'])
+        # only the blob and the tree, commits are not cached
+        self.assertEqual(
+            sum(len(files) for _, _, files in os.walk(objects)), 2
+        )
+
+    def test_run_job_seeded(self):
+        """Check that seeded jobs are reproducible."""
+
+        snapshot = graph.Graph('snapshot')
+        with open(USERS['200'], 'r') as f:
+            snapshot._parse_graph_data(f.read())
+
+        r1 = batch.run_job(snapshot, seed=3)
+        r2 = batch.run_job(snapshot, seed=3)
+
+        self.assertIsNone(r1['error'])
+        self.assertEqual(r1, r2)
+
+    def test_run_job_cached_plan(self):
+        """Check that unchanged graphs skip populate."""
+
+        snapshot = graph.Graph('snapshot')
+        with open(USERS['200'], 'r') as f:
+            snapshot._parse_graph_data(f.read())
+        plans = cache.PlanCache(os.path.join(self.dir.name, 'plans'))
+        output = os.path.join(self.dir.name, 'output')
+
+        r1 = batch.run_job(snapshot, seed=3, output_dir=output, plans=plans)
+        with mock.patch.object(batch.Repo, 'populate') as populate:
+            r2 = batch.run_job(
+                snapshot, seed=3, output_dir=output, plans=plans
+            )
+            populate.assert_not_called()
+
+        self.assertFalse(r1['cached'])
+        self.assertTrue(r2['cached'])
+        self.assertEqual(r1['head'], r2['head'])
+        self.assertGreater(r1['commits'], 0)
+        self.assertEqual(r2['commits'], 0)
+
+        # another seed results in another plan, all of whose days are
+        # already in the repository
+        with self.assertLogs(level='WARNING'):
+            r3 = batch.run_job(
+                snapshot, seed=4, output_dir=output, plans=plans
+            )
+        self.assertFalse(r3['cached'])
+        self.assertEqual(r3['head'], r1['head'])
+        self.assertEqual(r3['commits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
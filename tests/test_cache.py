@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.cache.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from pointilist import cache, fetch, graph
+
+from fixture_server import FixtureServer, STATIC_DIR, USERS
+
+
+class TestGraphCache(unittest.TestCase):
+    """Tests for the GraphCache class."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.dir.cleanup()
+
+    def test_fetch_fresh(self):
+        """Check that fresh entries are used without a request."""
+
+        c = cache.GraphCache(self.dir.name, ttl=3600)
+
+        g1 = graph.Graph('200')
+        self.assertTrue(c.fetch(g1, base_url=self.server.base_url))
+        g2 = graph.Graph('200')
+        self.assertFalse(c.fetch(g2, base_url=self.server.base_url))
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(g1.data, g2.data)
+
+    def test_fetch_not_modified(self):
+        """Check that stale entries are revalidated without parsing."""
+
+        c = cache.GraphCache(self.dir.name, ttl=0)
+
+        g1 = graph.Graph('200')
+        self.assertTrue(c.fetch(g1, base_url=self.server.base_url))
+        g2 = graph.Graph('200')
+        with mock.patch.object(
+                graph._GraphParser, 'feed', side_effect=AssertionError):
+            self.assertFalse(c.fetch(g2, base_url=self.server.base_url))
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotIn('If-None-Match', self.server.requests[0][1])
+        self.assertIn('If-None-Match', self.server.requests[1][1])
+        self.assertIn('If-Modified-Since', self.server.requests[1][1])
+        self.assertEqual(g1.data, g2.data)
+
+    def test_fetch_many_cached(self):
+        """Check that fetch_many() revalidates through the cache."""
+
+        c = cache.GraphCache(self.dir.name, ttl=0)
+
+        for _ in range(2):
+            results = list(fetch.fetch_many(
+                ['200'], base_url=self.server.base_url, cache=c
+            ))
+            self.assertIsNone(results[0][1])
+            self.assertEqual(len(results[0][0].data['rects']), 369)
+
+        self.assertIn('If-None-Match', self.server.requests[1][1])
+        self.assertIsNotNone(c.get('200')['body'])
+
+    def test_fetch_page_body(self):
+        """Check that a page body is cached up to the calendar."""
+
+        self.server.users['page'] = STATIC_DIR + 'profile.html'
+        c = cache.GraphCache(self.dir.name)
+
+        g = graph.Graph('page')
+        self.assertTrue(c.fetch(g, base_url=self.server.base_url))
+
+        body = c.get('page')['body']
+        with open(STATIC_DIR + 'profile.html', 'rb') as f:
+            self.assertLess(len(body), len(f.read()))
+        self.assertEqual(
+            graph._GraphParser.parse(body)['rects'], g.data['rects']
+        )
+
+    def test_eviction(self):
+        """Check that least recently used entries are evicted first."""
+
+        c = cache.GraphCache(self.dir.name, max_size=2500)
+        body = b'x' * 1000
+
+        c.put('a', body, {}, {})
+        c.put('b', body, {}, {})
+        past = time.time() - 10
+        os.utime(c._path('a'), (past, past))
+        os.utime(c._path('b'), (past + 1, past + 1))
+        c.get('a')
+        c.put('c', body, {}, {})
+
+        self.assertIsNotNone(c.get('a'))
+        self.assertIsNone(c.get('b'))
+        self.assertIsNotNone(c.get('c'))
+
+
+class TestPlanCache(unittest.TestCase):
+    """Tests for the PlanCache class."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.graph = graph.Graph('user')
+        with open(USERS['200'], 'r') as f:
+            self.graph._parse_graph_data(f.read())
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_key(self):
+        key = cache.PlanCache.key
+        self.assertEqual(
+            key(self.graph, 1, bias=[1, 2]), key(self.graph, 1, bias=[1, 2])
+        )
+        self.assertNotEqual(
+            key(self.graph, 1, bias=[1, 2]), key(self.graph, 2, bias=[1, 2])
+        )
+        self.assertNotEqual(
+            key(self.graph, 1, bias=[1, 2]), key(self.graph, 1, bias=[1])
+        )
+        with self.assertRaises(ValueError):
+            key(self.graph, None)
+
+    def test_put_get(self):
+        c = cache.PlanCache(self.dir.name)
+        key = c.key(self.graph, 1)
+        self.assertIsNone(c.get(key))
+
+        commits = self.graph.fill(seed=1)
+        c.put(key, commits, 'ab' * 20)
+        entry = c.get(key)
+        self.assertEqual(entry['commits'], commits)
+        self.assertEqual(entry['head'], 'ab' * 20)
+
+    def test_shared_directory(self):
+        """Check that plans and graphs are evicted separately."""
+
+        graphs = cache.GraphCache(self.dir.name, max_size=0)
+        plans = cache.PlanCache(self.dir.name)
+        plans.put('key', self.graph.fill(seed=1))
+        graphs.put('user', b'x', {}, {})
+
+        self.assertIsNone(graphs.get('user'))
+        self.assertIsNotNone(plans.get('key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
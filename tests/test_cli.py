@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.cli.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import dulwich.repo
+
+from pointilist import cli
+
+from fixture_server import FixtureServer
+from git_server import GitServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# modules only needed for fetching, parsing or writing repositories
+HEAVY_MODULES = [
+    'dulwich', 'urllib3', 'urllib.request', 'http.client',
+    'xml.etree.ElementTree', 'html.parser', 'pointilist.extract',
+    'pointilist.repo', 'pointilist.pack', 'pointilist.cache'
+]
+
+
+def _loaded_modules(code):
+    """Returns the modules loaded by a fresh interpreter running code."""
+
+    out = subprocess.check_output(
+        [sys.executable, '-c',
+         code + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        cwd=ROOT_DIR
+    )
+    return set(out.decode().split())
+
+
+class TestLazyImports(unittest.TestCase):
+    """Tests that the command line tool starts without heavy imports."""
+
+    def test_cli_import(self):
+        """Check that importing the CLI loads no heavy modules."""
+
+        loaded = _loaded_modules(
+            'import pointilist.cli\n'
+            'pointilist.cli._parser().parse_args(["fill", "-"])'
+        )
+        for name in HEAVY_MODULES + ['pointilist.graph']:
+            self.assertNotIn(name, loaded)
+
+    def test_graph_import(self):
+        """Check that importing graph loads no parser or network code."""
+
+        loaded = _loaded_modules('import pointilist.graph')
+        self.assertIn('pointilist.graph', loaded)
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, loaded)
+
+    def test_main_module(self):
+        """Check that 'python -m pointilist' runs the CLI."""
+
+        out = subprocess.check_output(
+            [sys.executable, '-m', 'pointilist', '--help'], cwd=ROOT_DIR
+        )
+        self.assertIn(b'populate', out)
+
+
+class TestCommands(unittest.TestCase):
+    """Tests the subcommands against a local server."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def _main(self, *argv):
+        with mock.patch('sys.stdout', new=io.StringIO()) as out, \
+                mock.patch('sys.stderr', new=io.StringIO()) as err:
+            status = cli.main(list(argv))
+        return status, out.getvalue(), err.getvalue()
+
+    def test_fetch_fill_populate(self):
+        """Check the complete workflow through intermediate files."""
+
+        status, _, _ = self._main(
+            'fetch', '200', '--base-url', self.server.base_url,
+            '-o', self._path('graph.json')
+        )
+        self.assertEqual(status, 0)
+
+        status, _, _ = self._main(
+            'fill', self._path('graph.json'), '--seed', '1',
+            '-o', self._path('plan')
+        )
+        self.assertEqual(status, 0)
+
+        with open(self._path('plan')) as f:
+            plan = [line.split() for line in f]
+        self.assertGreater(len(plan), 0)
+        self.assertEqual(plan, sorted(plan))
+
+        status, out, _ = self._main(
+            'populate', self._path('plan'), self._path('repo.git')
+        )
+        self.assertEqual(status, 0)
+
+        with dulwich.repo.Repo(self._path('repo.git')) as r:
+            head = r.refs[b'refs/heads/master']
+            self.assertEqual(out.strip(), head.decode())
+            self.assertEqual(
+                sum(1 for _ in r.get_walker(head)),
+                sum(int(count) for _, count in plan)
+            )
+
+    def test_populate_push(self):
+        """Check that populate --push updates the remote branch."""
+
+        remote = self._path('remote.git')
+        os.mkdir(remote)
+        dulwich.repo.Repo.init_bare(remote).close()
+        with open(self._path('plan'), 'w') as f:
+            f.write('2018-05-05 3\n2018-05-06 1\n')
+
+        with GitServer(remote) as server:
+            status, out, _ = self._main(
+                'populate', self._path('plan'), self._path('repo.git'),
+                '--push', server.base_url
+            )
+        self.assertEqual(status, 0)
+
+        with dulwich.repo.Repo(remote) as r:
+            self.assertEqual(
+                r.refs[b'refs/heads/master'].decode(), out.strip()
+            )
+
+    def test_plan(self):
+        """Check that plan equals fetch and fill with the same seed."""
+
+        status, _, _ = self._main(
+            'fetch', '200', '--base-url', self.server.base_url,
+            '-o', self._path('graph.json')
+        )
+        self.assertEqual(status, 0)
+        _, filled, _ = self._main(
+            'fill', self._path('graph.json'), '--seed', '7'
+        )
+
+        status, planned, _ = self._main(
+            'plan', '200', '--base-url', self.server.base_url,
+            '--seed', '7', '--cache', self._path('cache')
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual(planned, filled)
+
+    def test_errors(self):
+        """Check that errors are reported with a non-zero exit status."""
+
+        status, _, err = self._main(
+            'fetch', 'garbage', '--base-url', self.server.base_url
+        )
+        self.assertEqual(status, 1)
+        self.assertIn('Expected svg', err)
+
+        with open(self._path('plan'), 'w') as f:
+            f.write('2018-05-05 3\nfoo\n')
+        status, _, err = self._main(
+            'populate', self._path('plan'), self._path('repo.git')
+        )
+        self.assertEqual(status, 1)
+        self.assertIn('Invalid plan line 2', err)
+
+
+if __name__ == '__main__':
+    unittest.main()
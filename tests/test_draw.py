@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.draw and Graph.draw().
+"""
+
+import os
+import unittest
+
+from pointilist import draw, graph
+from pointilist.rects import date_to_ordinal
+
+STATIC_DIR = os.path.dirname(os.path.realpath(__file__)) \
+        + '/static/'
+CONTRIB_HTML = STATIC_DIR + 'contributions.html'
+
+
+def _load():
+    g = graph.Graph('user')
+    with open(CONTRIB_HTML, 'r') as f:
+        g._parse_graph_data(f.read())
+    return g
+
+
+def _shades(g):
+    """Returns the shade of every day after the planned commits."""
+
+    rects = g.data['rects']
+    added = dict(zip(g.data['commits'].dates, g.data['commits'].counts))
+    counts = [
+        count + added.get(date, 0)
+        for date, count in zip(rects.dates, rects.counts)
+    ]
+    ranges = graph.shade_ranges(max(counts))
+    return [
+        next(i for i, r in enumerate(ranges) if count in r)
+        for count in counts
+    ]
+
+
+class TestRasters(unittest.TestCase):
+    """Tests for the raster functions."""
+
+    def test_glyph(self):
+        raster = draw.glyph('T', 3)
+        self.assertEqual(len(raster), 3)
+        self.assertEqual(raster[0], (0, 3, 0, 0, 0, 0, 0))
+        self.assertEqual(raster[1], (0, 3, 3, 3, 3, 3, 0))
+
+    def test_glyph_unknown(self):
+        with self.assertRaises(ValueError):
+            draw.glyph('~')
+
+    def test_text(self):
+        raster = draw.text('hi!')
+        self.assertEqual(len(raster), 3 + 1 + 3 + 1 + 1)
+        self.assertEqual(raster[3], (0,) * 7)
+        self.assertEqual(raster[:3], draw.glyph('H'))
+        self.assertIs(raster, draw.text('hi!'))
+        self.assertTrue(all(len(column) == 7 for column in raster))
+
+    def test_bitmap(self):
+        raster = draw.bitmap(['#.', ' 2'])
+        self.assertEqual(raster, (
+            (None, None, 4, None, None, None, None),
+            (None, None, 0, 2, None, None, None)
+        ))
+        with self.assertRaises(ValueError):
+            draw.bitmap(['x'])
+        with self.assertRaises(ValueError):
+            draw.bitmap(['#'] * 8)
+
+    def test_image(self):
+        raster = draw.image([[0, 255, 128]] * 7)
+        self.assertEqual(raster, ((4,) * 7, (0,) * 7, (2,) * 7))
+
+
+class TestDrawMethod(unittest.TestCase):
+    """Tests for the Graph.draw() method."""
+
+    def _load_empty(self):
+        g = _load()
+        counts = g.data['rects'].counts
+        for idx in range(len(counts)):
+            counts[idx] = 0
+        # without any commits, the default fills are used
+        with self.assertLogs(level='INFO'):
+            g._create_colormap()
+        return g
+
+    def test_draw_text(self):
+        g = self._load_empty()
+        raster = draw.text('Hi')
+        g.draw(raster, column=2)
+
+        grid, width = g._grid()
+        self.assertEqual(width, 53)
+        shades = _shades(g)
+        for col, cells in enumerate(raster, 2):
+            for row, shade in enumerate(cells):
+                self.assertEqual(shades[grid[col, row]], shade)
+        self.assertEqual(
+            sum(g.data['commits'].counts),
+            sum(1 for cells in raster for shade in cells if shade)
+        )
+        # the first cell of the H is the second Monday of the plan
+        self.assertEqual(
+            g.data['commits'].dates[0], date_to_ordinal('2017-06-12')
+        )
+
+    def test_draw_over_existing(self):
+        """Check drawing with transparent pixels on an active graph."""
+
+        g = _load()
+        raster = draw.bitmap(['# #', ' 1 '])
+        g.draw(raster)
+
+        grid, width = g._grid()
+        column = (width - len(raster)) // 2
+        shades = _shades(g)
+        self.assertEqual(shades[grid[column, 2]], 4)
+        self.assertEqual(shades[grid[column + 1, 3]], 1)
+        self.assertEqual(shades[grid[column + 2, 2]], 4)
+
+    def test_draw_out_of_bounds(self):
+        g = self._load_empty()
+        with self.assertRaises(ValueError):
+            g.draw(draw.text('x'), column=51)
+        with self.assertRaises(ValueError):
+            g.draw(draw.text('x'), column=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
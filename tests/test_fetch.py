@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.fetch.
+"""
+
+import unittest
+from urllib.error import HTTPError
+
+from pointilist import fetch
+
+from fixture_server import STATIC_DIR, FixtureServer
+
+
+class TestFetchMany(unittest.TestCase):
+    """Tests for the fetch_many() function."""
+
+    def setUp(self):
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_fetch_many(self):
+        """Check successful and failing fetches are reported per user."""
+
+        usernames = ['200', 'garbage', 'short', '404']
+        results = {
+            graph.username: (graph, error)
+            for graph, error in fetch.fetch_many(
+                usernames, concurrency=2, base_url=self.server.base_url
+            )
+        }
+
+        self.assertEqual(sorted(results), sorted(usernames))
+
+        graph, error = results['200']
+        self.assertIsNone(error)
+        self.assertEqual(len(graph.data['rects']), 369)
+        self.assertEqual(len(graph.data['colormap']), 5)
+
+        self.assertEqual(
+            'Expected svg, got html', str(results['garbage'][1])
+        )
+        self.assertEqual(
+            'Too few data points in graph: 14 < 365',
+            str(results['short'][1])
+        )
+        self.assertIsInstance(results['404'][1], HTTPError)
+        self.assertEqual(results['404'][1].code, 404)
+
+    def test_fetch_many_reuses_connections(self):
+        """Check that requests share keep-alive connections."""
+
+        results = list(fetch.fetch_many(
+            ['200'] * 8, concurrency=2, base_url=self.server.base_url
+        ))
+
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(error is None for _, error in results))
+        self.assertEqual(len(self.server.requests), 8)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_fetch_many_html_page(self):
+        """Check that graphs are extracted from full profile pages."""
+
+        self.server.users['page'] = STATIC_DIR + 'profile.html'
+        results = list(fetch.fetch_many(
+            ['page', 'page', '200'], concurrency=1,
+            base_url=self.server.base_url
+        ))
+
+        self.assertTrue(all(error is None for _, error in results))
+        self.assertEqual(
+            [graph.data['rects'] for graph, _ in results[:2]],
+            [results[2][0].data['rects']] * 2
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.futures.
+"""
+
+import concurrent.futures
+import threading
+import time
+import unittest
+
+from pointilist import futures
+
+
+class TestAsCompleted(unittest.TestCase):
+    """Tests for the as_completed() function."""
+
+    def test_limit(self):
+        """Check that no more than limit tasks are pending at once."""
+
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def work(n):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return n * n
+
+        tasks = ((n, work, (n,)) for n in range(20))
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            results = {
+                key: future.result()
+                for key, future in futures.as_completed(
+                    executor, lambda: next(tasks, None), 3
+                )
+            }
+
+        self.assertEqual(results, {n: n * n for n in range(20)})
+        self.assertLessEqual(running[1], 3)
+
+    def test_tasks_added_while_iterating(self):
+        """Check that next_task() is asked again after every task."""
+
+        queue = ['a']
+
+        def next_task():
+            if not queue:
+                return None
+            key = queue.pop(0)
+            return key, str.upper, (key,)
+
+        keys = []
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            for key, future in futures.as_completed(executor, next_task, 1):
+                keys.append(future.result())
+                if key == 'a':
+                    queue.append('b')
+
+        self.assertEqual(keys, ['A', 'B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,12 +7,14 @@
 """
 
 import os
+import random
 import unittest
 import urllib.request
 from urllib.error import HTTPError
 from io import StringIO
 
 from pointilist import graph
+from pointilist.rects import date_to_ordinal, ordinal_to_date
 
 STATIC_DIR = os.path.dirname(os.path.realpath(__file__)) \
         + '/static/'
@@ -20,6 +22,7 @@ CONTRIB_HTML = STATIC_DIR + 'contributions.html'
 GARBAGE_HTML = STATIC_DIR + 'hello_world.html'
 SHORT_HTML = STATIC_DIR + 'contributions_short.html'
 CLASS_HTML = STATIC_DIR + 'contributions_wrong_class.html'
+PROFILE_HTML = STATIC_DIR + 'profile.html'
 
 
 VALID_GRAPH_REFERENCE_DATA = {
@@ -536,6 +539,170 @@ class TestFetchMethod(unittest.TestCase):
         self.assertEqual(exc.code, 404)
 
 
+class TestGraphParser(unittest.TestCase):
+    """Tests for the incremental graph data parser."""
+
+    def test_parse_small_chunks(self):
+        """Check that chunk boundaries do not affect the parsed data."""
+
+        with open(CONTRIB_HTML, 'r') as f:
+            data = f.read()
+
+        parser = graph._GraphParser()
+        for i in range(0, len(data), 7):
+            parser.feed(data[i:i + 7])
+        parsed = parser.close()
+
+        for key in ['rects', 'months', 'wdays']:
+            self.assertEqual(parsed[key], VALID_GRAPH_REFERENCE_DATA[key])
+
+    def test_parse_rejects_root_early(self):
+        """Check that a wrong svg root element is rejected immediately."""
+
+        parser = graph._GraphParser()
+        with self.assertRaises(ValueError) as cm:
+            parser.feed('<svg class="foo">')
+
+        self.assertEqual(
+            'Expected class js-calendar-graph-svg, got foo',
+            str(cm.exception)
+        )
+
+    def test_parse_page_without_calendar(self):
+        """Check that pages and inputs without a calendar are rejected."""
+
+        parser = graph._GraphParser()
+        parser.feed('<html><body><svg class="octicon"></svg>')
+        parser.feed('</body></html>')
+        with self.assertRaises(ValueError) as cm:
+            parser.close()
+        self.assertEqual('Expected svg, got html', str(cm.exception))
+
+        with self.assertRaises(ValueError) as cm:
+            graph._GraphParser().close()
+        self.assertEqual('Expected svg, got nothing', str(cm.exception))
+
+    def test_parse_html_page(self):
+        """Check that the calendar is extracted from a full page."""
+
+        with open(PROFILE_HTML, 'rb') as f:
+            data = f.read()
+        end = data.index(b'</svg>', data.index(b'js-calendar-graph-svg'))
+
+        parser = graph._GraphParser()
+        # small chunks split multi-byte characters
+        for i in range(0, len(data), 7):
+            parser.feed(data[i:i + 7])
+            self.assertEqual(parser.done, i + 7 >= end + len(b'</svg>'))
+            if parser.done:
+                break
+        parsed = parser.close()
+
+        for key in ['rects', 'months', 'wdays']:
+            self.assertEqual(parsed[key], VALID_GRAPH_REFERENCE_DATA[key])
+
+    def test_parse_truncated_page(self):
+        with open(PROFILE_HTML, 'r') as f:
+            data = f.read()
+
+        parser = graph._GraphParser()
+        parser.feed(data[:data.index('2018-05-01')])
+        with self.assertRaises(ValueError) as cm:
+            parser.close()
+        self.assertEqual(
+            'Contribution calendar is truncated', str(cm.exception)
+        )
+
+    def test_parse_max_size(self):
+        with open(PROFILE_HTML, 'r') as f:
+            data = f.read()
+
+        parser = graph._GraphParser(max_size=4096)
+        with self.assertRaises(ValueError) as cm:
+            for i in range(0, len(data), 1024):
+                parser.feed(data[i:i + 1024])
+        self.assertEqual('Graph data exceeds 4096 bytes', str(cm.exception))
+        self.assertEqual(i, 4096)
+
+    def test_load_stops_early(self):
+        """Check that no data is read after the end of the calendar."""
+
+        with open(PROFILE_HTML, 'r') as f:
+            data = f.read()
+        end = data.index('</svg>', data.index('js-calendar-graph-svg'))
+        read = []
+
+        def chunks():
+            for i in range(0, len(data), 1024):
+                read.append(i)
+                yield data[i:i + 1024]
+
+        g = graph.Graph('user')
+        self.assertTrue(g._load(chunks()))
+        self.assertEqual(g.data['rects'], VALID_GRAPH_REFERENCE_DATA['rects'])
+        self.assertLess(read[-1], end + 1024)
+        self.assertLess(len(read), len(data) // 1024)
+
+
+class TestFingerprint(unittest.TestCase):
+    """Tests for the Graph.fingerprint property."""
+
+    def test_fingerprint(self):
+        g1 = graph.Graph('user1')
+        with open(CONTRIB_HTML, 'r') as f:
+            g1._parse_graph_data(f.read())
+        g2 = graph.Graph('user2')
+        g2.data = dict(g1.data)
+        g2.data['rects'] = list(g1.data['rects'])
+
+        self.assertEqual(g1.fingerprint, g2.fingerprint)
+        self.assertEqual(
+            g1.fingerprint,
+            '4acbec402f26a80fb71dbdd421397cdb'
+            '07642511be5d9b5b33c2ee199f22b9eb'
+        )
+
+        g2.data['rects'][0] = dict(g2.data['rects'][0], count=1)
+        self.assertNotEqual(g1.fingerprint, g2.fingerprint)
+
+    def test_fingerprint_empty_data(self):
+        with self.assertRaises(ValueError):
+            graph.Graph('user').fingerprint
+
+
+class TestShadeForMethod(unittest.TestCase):
+    """Tests for the Graph.shade_for() method."""
+
+    def test_shade_for_empty_data(self):
+        """Check for ValueError if fetch() was not called before."""
+
+        g = graph.Graph('user')
+        with self.assertRaises(ValueError):
+            g.shade_for(1)
+
+    def test_shade_for_valid_data(self):
+        g = graph.Graph('user')
+        g.data = VALID_GRAPH_REFERENCE_DATA
+
+        self.assertEqual(
+            [g.shade_for(c) for c in [0, 1, 2, 3, 4, 7, 100]],
+            [0, 1, 2, 3, 4, 4, 4]
+        )
+        with self.assertRaises(ValueError):
+            g.shade_for(-1)
+
+    def test_shade_for_matches_fills(self):
+        """Check that every parsed day maps to its own fill."""
+
+        with open(CONTRIB_HTML, 'r') as f:
+            g = graph.Graph('user')
+            g._parse_graph_data(f.read())
+
+        for rect in g.data['rects']:
+            shade = g.shade_for(rect['count'])
+            self.assertEqual(g.data['colormap'][shade]['fill'], rect['fill'])
+
+
 class TestFillMethod(unittest.TestCase):
     """Tests for the Graph.fill() method."""
 
@@ -563,6 +730,195 @@ class TestFillMethod(unittest.TestCase):
         self.assertIn(g.data['commits'][123]['count'], range(0, 5))
         self.assertEqual(g.data['commits'][123]['date'], '2018-05-30')
 
+    def test_fill_seeded(self):
+        """Check that equal seeds result in equal fills."""
+
+        g = graph.Graph('user')
+        g.data = VALID_GRAPH_REFERENCE_DATA
+
+        commits = g.fill(seed=42)
+        self.assertIs(commits, g.data['commits'])
+        self.assertEqual(commits, g.fill(seed=42))
+        self.assertEqual(commits, g.fill(seed=random.Random(42)))
+        self.assertTrue(set(commits.counts) <= {0, 1, 2, 3, 4})
+
+
+class TestCommitsMethod(unittest.TestCase):
+    """Tests for the Graph.commits() method."""
+
+    def test_commits_not_filled(self):
+        """Check for ValueError if fill() was not called before."""
+
+        g = graph.Graph('user')
+        with self.assertRaises(ValueError):
+            g.commits()
+
+    def test_commits_records(self):
+        g = graph.Graph('user')
+        g.data = dict(VALID_GRAPH_REFERENCE_DATA)
+        g.fill(seed=1)
+
+        records = list(g.commits())
+        self.assertEqual(len(records), 124)
+        self.assertEqual(
+            [(ordinal_to_date(d), c) for d, c in records],
+            [(c['date'], c['count']) for c in g.data['commits']]
+        )
+
+
+class TestFillManyFunction(unittest.TestCase):
+    """Tests for the fill_many() function."""
+
+    def test_fill_many(self):
+        g1 = graph.Graph('user1')
+        g1.data = dict(VALID_GRAPH_REFERENCE_DATA)
+        g2 = graph.Graph('user2')
+        g2.data = dict(VALID_GRAPH_REFERENCE_DATA)
+
+        result = graph.fill_many([g1, g2], seed=7)
+
+        self.assertEqual(len(result), 2)
+        self.assertIs(result[0], g1.data['commits'])
+        self.assertIs(result[1], g2.data['commits'])
+        self.assertEqual(len(result[0]), 124)
+        self.assertEqual(len(result[1]), 124)
+        self.assertEqual(result, graph.fill_many([g1, g2], seed=7))
+
+    def test_fill_many_without_choices(self):
+        """Check that generators without choices() can be used."""
+
+        class _Random:
+            # like random.Random of Python 3.5
+            def __init__(self, seed):
+                self.randrange = random.Random(seed).randrange
+
+        g = graph.Graph('user')
+        g.data = dict(VALID_GRAPH_REFERENCE_DATA)
+        commits, = graph.fill_many([g], seed=_Random(5))
+
+        self.assertEqual(len(commits), 124)
+        self.assertTrue(set(commits.counts) <= {0, 1, 2, 3, 4})
+
+    def test_fill_many_empty_data(self):
+        """Check for ValueError if any graph has not been fetched."""
+
+        g = graph.Graph('user')
+        g.data = VALID_GRAPH_REFERENCE_DATA
+        with self.assertRaises(ValueError):
+            graph.fill_many([g, graph.Graph('user2')])
+
+
+def _shades(counts):
+    """Returns the shades github shows for counts."""
+
+    ranges = graph.shade_ranges(max(counts))
+    return [
+        next(i for i, r in enumerate(ranges) if count in r)
+        for count in counts
+    ]
+
+
+class TestSolveShadesFunction(unittest.TestCase):
+    """Tests for the shade_ranges() and solve_shades() functions."""
+
+    def test_shade_ranges(self):
+        self.assertEqual(
+            graph.shade_ranges(7),
+            [c['range'] for c in VALID_GRAPH_REFERENCE_DATA['colormap']]
+        )
+        self.assertEqual(
+            graph.shade_ranges(30),
+            [range(0, 1), range(1, 6), range(6, 11), range(11, 16),
+             range(16, 31)]
+        )
+
+    def test_solve_without_shift(self):
+        added = graph.solve_shades([0, 0, 0, 10], [1, 4, None, None])
+        self.assertEqual(added, [1, 6, 0, 0])
+
+    def test_solve_with_shift(self):
+        """Check that the maximum is raised to keep a busy day light."""
+
+        added = graph.solve_shades([0, 5, 0], [None, 1, 0])
+        self.assertEqual(added, [30, 0, 0])
+        self.assertEqual(_shades([30, 5, 0])[1:], [1, 0])
+
+    def test_solve_minimal(self):
+        """Check against an exhaustive search on small inputs."""
+
+        rng = random.Random(3)
+        for _ in range(10):
+            counts = [rng.randint(0, 2) for _ in range(3)]
+            shades = [rng.choice([None, 1, 2, 3, 4]) for _ in range(3)]
+
+            best = None
+            # counts of at most 2 never need more than 6 * 2 commits
+            for a in range(13):
+                for b in range(13):
+                    for c in range(13):
+                        total = [n + d for n, d in zip(counts, (a, b, c))]
+                        if all(s is None or s == t for s, t in
+                               zip(shades, _shades(total))):
+                            if best is None or a + b + c < best:
+                                best = a + b + c
+
+            try:
+                added = graph.solve_shades(counts, shades)
+            except ValueError:
+                self.assertIsNone(best)
+                continue
+            total = [n + d for n, d in zip(counts, added)]
+            for wanted, shade in zip(shades, _shades(total)):
+                if wanted is not None:
+                    self.assertEqual(shade, wanted)
+            self.assertEqual(sum(added), best)
+
+    def test_solve_invalid(self):
+        with self.assertRaises(ValueError):
+            graph.solve_shades([1, 0], [0, 4])
+        with self.assertRaises(ValueError):
+            graph.solve_shades([0, 0], [5, 4])
+        with self.assertRaises(ValueError):
+            graph.solve_shades([1, 0], [1, 2])
+
+
+class TestFillShadesMethod(unittest.TestCase):
+    """Tests for the Graph.fill_shades() method."""
+
+    def test_fill_shades_dates(self):
+        g = graph.Graph('user')
+        g.data = dict(VALID_GRAPH_REFERENCE_DATA)
+
+        commits = g.fill_shades({'2018-05-29': 4, '2018-05-30': 2})
+        self.assertIs(commits, g.data['commits'])
+        self.assertEqual(commits, [
+            {'date': '2018-05-29', 'count': 4},
+            {'date': '2018-05-30', 'count': 2}
+        ])
+
+    def test_fill_shades_sequence(self):
+        g = graph.Graph('user')
+        g.data = dict(VALID_GRAPH_REFERENCE_DATA)
+        rects = VALID_GRAPH_REFERENCE_DATA['rects']
+
+        # the last day is left free to carry the new maximum
+        commits = g.fill_shades([1] * (len(rects) - 1) + [None])
+        added = dict(zip(commits.dates, commits.counts))
+        total = [
+            r['count'] + added.get(date_to_ordinal(r['date']), 0)
+            for r in rects
+        ]
+        self.assertEqual(set(_shades(total)[:-1]), {1})
+        self.assertEqual(max(total), 6 * max(r['count'] for r in rects))
+
+    def test_fill_shades_invalid(self):
+        g = graph.Graph('user')
+        g.data = dict(VALID_GRAPH_REFERENCE_DATA)
+        with self.assertRaises(ValueError):
+            g.fill_shades([1, 2])
+        with self.assertRaises(ValueError):
+            g.fill_shades({'2019-01-01': 1})
+
 
 if __name__ == '__main__':
     unittest.main()
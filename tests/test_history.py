@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.history.
+"""
+
+import datetime
+import os
+import unittest
+
+from pointilist import graph
+from pointilist.history import Calendar
+from pointilist.rects import CommitArray, date_to_ordinal
+
+STATIC_DIR = os.path.dirname(os.path.realpath(__file__)) \
+        + '/static/'
+CONTRIB_HTML = STATIC_DIR + 'contributions.html'
+
+
+def _day(date):
+    return date_to_ordinal(date)
+
+
+class TestCalendar(unittest.TestCase):
+    """Tests for the Calendar class."""
+
+    def test_empty(self):
+        cal = Calendar()
+        self.assertEqual(len(cal), 0)
+        self.assertIsNone(cal.first)
+        self.assertEqual(cal.weeks, 0)
+        self.assertNotIn('2018-05-05', cal)
+        with self.assertRaises(KeyError):
+            cal['2018-05-05']
+
+    def test_set_and_get(self):
+        cal = Calendar()
+        cal['2018-05-05'] = 3
+        cal[_day('2016-01-01')] = 0
+
+        self.assertEqual(cal[_day('2018-05-05')], 3)
+        self.assertEqual(cal['2016-01-01'], 0)
+        self.assertNotIn('2017-01-01', cal)
+        self.assertEqual(len(cal), 2)
+        self.assertEqual(cal.first, _day('2016-01-01'))
+        self.assertEqual(cal.last, _day('2018-05-05'))
+        self.assertEqual(
+            list(cal.items()),
+            [(_day('2016-01-01'), 0), (_day('2018-05-05'), 3)]
+        )
+
+        del cal['2016-01-01']
+        self.assertEqual(len(cal), 1)
+        with self.assertRaises(KeyError):
+            del cal['2016-01-01']
+        with self.assertRaises(ValueError):
+            cal['2018-05-06'] = -1
+
+    def test_cells(self):
+        cal = Calendar({'2018-05-02': 1, '2018-05-31': 2}.items())
+
+        # 2018-04-29 is the Sunday before the first day
+        self.assertEqual(cal.cell('2018-04-29'), (0, 0))
+        self.assertEqual(cal.cell('2018-05-02'), (0, 3))
+        self.assertEqual(cal.cell('2018-05-31'), (4, 4))
+        self.assertEqual(cal.weeks, 5)
+        for week in range(cal.weeks):
+            for weekday in range(7):
+                date = cal.date(week, weekday)
+                self.assertEqual(cal.cell(date), (week, weekday))
+                self.assertEqual(
+                    datetime.date.fromordinal(date).isoweekday() % 7,
+                    weekday
+                )
+        with self.assertRaises(KeyError):
+            cal.date(5, 0)
+        with self.assertRaises(KeyError):
+            cal.cell('2018-06-10')
+
+    def test_slice(self):
+        cal = Calendar(
+            (_day('2018-05-01') + n, n) for n in range(31)
+        )
+
+        part = cal['2018-05-10':'2018-05-20']
+        self.assertEqual(len(part), 10)
+        self.assertEqual(part.first, _day('2018-05-10'))
+        self.assertEqual(part.last, _day('2018-05-19'))
+        self.assertEqual(part['2018-05-15'], 14)
+        self.assertEqual(len(cal[:'2018-05-03']), 2)
+        self.assertEqual(len(cal['2018-05-30':]), 2)
+        self.assertEqual(len(cal['2019-01-01':]), 0)
+        with self.assertRaises(ValueError):
+            cal[::2]
+
+    def test_merge_windows(self):
+        """Check that graphs of overlapping windows are merged."""
+
+        g = graph.Graph('user')
+        with open(CONTRIB_HTML, 'r') as f:
+            g._parse_graph_data(f.read())
+        rects = g.data['rects']
+
+        cal = Calendar(rects)
+        self.assertEqual(len(cal), len(rects))
+        self.assertEqual(cal.first, rects.dates[0])
+        self.assertEqual(cal.weeks, 53)
+
+        older = Calendar(
+            (rects.dates[0] - 400 + n, 1) for n in range(500)
+        )
+        older.merge(cal)
+        self.assertEqual(len(older), len(rects) + 400)
+        self.assertEqual(older[rects.dates[0] - 400], 1)
+        self.assertEqual(older[rects.dates[10]], rects.counts[10])
+
+    def test_add_plan(self):
+        cal = Calendar([('2018-05-05', 2)])
+        cal.add(CommitArray.from_dicts([
+            {'date': '2018-05-05', 'count': 1},
+            {'date': '2018-05-06', 'count': 3}
+        ]))
+        self.assertEqual(dict(cal), {
+            _day('2018-05-05'): 3,
+            _day('2018-05-06'): 3
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
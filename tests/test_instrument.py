@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.instrument.
+"""
+
+import os
+import unittest
+
+from pointilist import graph, instrument, repo
+
+from fixture_server import FixtureServer, USERS
+
+
+class TestSinks(unittest.TestCase):
+    """Tests for registering and calling sinks."""
+
+    def tearDown(self):
+        instrument._sinks = []
+
+    def test_disabled(self):
+        """Check that spans are no-ops without sinks."""
+
+        self.assertFalse(instrument.enabled())
+        self.assertIs(instrument.span('a'), instrument.span('b'))
+        with instrument.span('a'):
+            instrument.count('c')
+
+    def test_recorder(self):
+        recorder = instrument.Recorder()
+        instrument.add_sink(recorder)
+        self.assertTrue(instrument.enabled())
+
+        with instrument.span('a'):
+            pass
+        instrument.record('a', 2.0)
+        instrument.count('c', 3)
+        instrument.count('c')
+
+        self.assertEqual(len(recorder.spans['a']), 2)
+        self.assertEqual(recorder.spans['a'][1], 2.0)
+        self.assertEqual(recorder.counters, {'c': 4})
+
+        instrument.remove_sink(recorder)
+        self.assertFalse(instrument.enabled())
+
+    def test_failing_sink(self):
+        """Check that a failing sink does not affect other sinks."""
+
+        def failing(kind, name, value):
+            raise RuntimeError('sink failure')
+
+        recorder = instrument.Recorder()
+        instrument.add_sink(failing)
+        instrument.add_sink(recorder)
+        with self.assertLogs(level='ERROR'):
+            instrument.count('c')
+
+        self.assertEqual(recorder.counters, {'c': 1})
+
+
+class TestStages(unittest.TestCase):
+    """Tests for the spans and counters reported by pointilist."""
+
+    def setUp(self):
+        self.recorder = instrument.Recorder()
+        instrument.add_sink(self.recorder)
+
+    def tearDown(self):
+        instrument.remove_sink(self.recorder)
+
+    def test_pipeline(self):
+        with FixtureServer() as server:
+            g = graph.Graph('200')
+            g.fetch(server.base_url)
+        g.fill(seed=0)
+        with repo.Repo(g.commits(), in_memory=True) as r:
+            r.populate()
+            objects = len(r.objects)
+
+        spans = self.recorder.spans
+        counters = self.recorder.counters
+        for name in ['network', 'parse', 'colormap', 'fill', 'write']:
+            self.assertEqual(len(spans[name]), 1, name)
+            self.assertGreaterEqual(spans[name][0], 0.0)
+
+        self.assertEqual(
+            counters['bytes_fetched'], os.path.getsize(USERS['200'])
+        )
+        self.assertEqual(counters['rects_parsed'], 369)
+        self.assertEqual(
+            counters['commits_written'], sum(g.data['commits'].counts)
+        )
+        self.assertEqual(counters['objects_written'], objects)
+
+    def test_validate(self):
+        with open(USERS['200'], 'r') as f:
+            graph.Graph._graph_data_valid(f.read())
+
+        self.assertEqual(len(self.recorder.spans['validate']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.pack.
+"""
+
+import io
+import os
+import pickle
+import random
+import tempfile
+import unittest
+
+from pointilist import pack
+
+BLOB_HELLO_SHA = 'ce013625030ba8dba906f756967f9e9ca394464a'
+
+
+class TestHashObject(unittest.TestCase):
+    """Tests for the hash_object() function."""
+
+    def test_hash_blob(self):
+        """Check against the SHA-1 git computes for 'hello\\n'."""
+
+        self.assertEqual(
+            pack.hash_object(pack.OBJ_BLOB, b'hello\n').hex(),
+            BLOB_HELLO_SHA
+        )
+
+
+class TestPackWriter(unittest.TestCase):
+    """Tests for the PackWriter class."""
+
+    def _write(self, f, count=None):
+        writer = pack.PackWriter(f, count=count)
+        writer.add(pack.OBJ_BLOB, b'hello\n')
+        writer.add(pack.OBJ_BLOB, b'hello\n')
+        writer.add(pack.OBJ_BLOB, b'x' * 1000)
+        writer.close()
+        return writer
+
+    def test_streamed_equals_patched(self):
+        """Check that known and unknown object counts give equal packs."""
+
+        patched = io.BytesIO()
+        w1 = self._write(patched)
+        streamed = io.BytesIO()
+        w2 = self._write(streamed, count=2)
+
+        self.assertEqual(patched.getvalue(), streamed.getvalue())
+        self.assertEqual(w1.checksum, w2.checksum)
+        self.assertEqual(len(w1.entries), 2)
+        self.assertEqual(patched.getvalue()[:12], b'PACK\0\0\0\2\0\0\0\2')
+
+    def test_count_mismatch(self):
+        with self.assertRaises(ValueError):
+            self._write(io.BytesIO(), count=3)
+
+    def test_write_index(self):
+        f = io.BytesIO()
+        writer = self._write(f)
+        idx = io.BytesIO()
+        pack.write_index(idx, writer.entries, writer.checksum)
+
+        data = idx.getvalue()
+        self.assertEqual(data[:8], b'\xfftOc\0\0\0\2')
+        self.assertEqual(len(data), 8 + 256 * 4 + 2 * (20 + 4 + 4) + 40)
+        self.assertEqual(data[-40:-20], writer.checksum)
+
+
+class TestMemoryObjectStore(unittest.TestCase):
+    """Tests for the MemoryObjectStore class."""
+
+    def test_iter_pack(self):
+        """Check that the streamed pack equals the written one."""
+
+        store = pack.MemoryObjectStore()
+        rng = random.Random(1)
+        for _ in range(50):
+            store.add(pack.OBJ_BLOB, bytes(
+                rng.getrandbits(8) for _ in range(200)
+            ))
+        f = io.BytesIO()
+        store.write_pack(f)
+
+        chunks = list(store.iter_pack(chunk_size=1024))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(b''.join(chunks), f.getvalue())
+        self.assertEqual(store.pack_size(), len(f.getvalue()))
+
+
+class TestObjectCache(unittest.TestCase):
+    """Tests for the ObjectCache class."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_encode(self):
+        cache = pack.ObjectCache()
+        sha, entry = cache.encode(pack.OBJ_BLOB, b'hello\n')
+        self.assertEqual(sha.hex(), BLOB_HELLO_SHA)
+        self.assertEqual(entry, pack.encode_entry(pack.OBJ_BLOB, b'hello\n'))
+        self.assertEqual(cache.encode(pack.OBJ_BLOB, b'hello\n', sha),
+                         (sha, entry))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.size, len(entry))
+
+    def test_commits_not_cached(self):
+        """Check that commits are encoded without the cache."""
+
+        cache = pack.ObjectCache()
+        data = pack.serialize_commit(
+            pack.hash_object(pack.OBJ_TREE, b''), [], b'a <a@b>', 0, b'm\n'
+        )
+        for _ in range(2):
+            sha, entry = cache.encode(pack.OBJ_COMMIT, data)
+        self.assertEqual(sha, pack.hash_object(pack.OBJ_COMMIT, data))
+        self.assertEqual(entry, pack.encode_entry(pack.OBJ_COMMIT, data))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+
+    def test_commit_factory(self):
+        tree = pack.hash_object(pack.OBJ_TREE, b'')
+        cache = pack.ObjectCache()
+        factory = cache.commit_factory(tree, b'a <a@b>', b'm\n')
+        self.assertIs(cache.commit_factory(tree, b'a <a@b>', b'm\n'), factory)
+        self.assertIsNot(cache.commit_factory(tree, b'b <a@b>', b'm\n'),
+                         factory)
+
+    def test_lru(self):
+        cache = pack.ObjectCache(max_size=250)
+        shas = [bytes([n]) * 20 for n in range(3)]
+        cache.put(shas[0], b'a' * 100)
+        cache.put(shas[1], b'b' * 100)
+        cache.get(shas[0])
+        cache.put(shas[2], b'c' * 100)
+
+        self.assertIsNone(cache.get(shas[1]))
+        self.assertEqual(cache.get(shas[0]), b'a' * 100)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, 200)
+
+    def test_disk_tier(self):
+        """Check that evicted entries are found on disk."""
+
+        cache = pack.ObjectCache(max_size=150, directory=self.dir.name)
+        shas = [bytes([n]) * 20 for n in range(3)]
+        for n, sha in enumerate(shas):
+            cache.put(sha, bytes([n]) * 100)
+        self.assertEqual(len(cache), 1)
+
+        # other processes get the directory but not the memory tier
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(len(copy), 0)
+        self.assertEqual(copy.get(shas[1]), bytes([1]) * 100)
+        self.assertIsNone(copy.get(shas[2]))
+        cache.flush()
+        self.assertEqual(copy.get(shas[2]), bytes([2]) * 100)
+
+        self.assertEqual(cache.get(shas[0]), bytes([0]) * 100)
+        self.assertEqual(list(cache._entries), [shas[0]])
+
+    def test_disk_limit(self):
+        """Check that the files used least recently are removed."""
+
+        cache = pack.ObjectCache(
+            max_size=0, directory=self.dir.name, max_disk_size=250
+        )
+        shas = [bytes([n]) * 20 for n in range(3)]
+        cache.put(shas[0], b'a' * 100)
+        cache.put(shas[1], b'b' * 100)
+        for n, sha in enumerate(shas[:2]):
+            os.utime(cache._path(sha), (n, n))
+        self.assertEqual(cache.get(shas[0]), b'a' * 100)
+        cache.put(shas[2], b'c' * 100)
+
+        self.assertIsNone(cache.get(shas[1]))
+        self.assertEqual(cache.get(shas[0]), b'a' * 100)
+        self.assertEqual(cache.get(shas[2]), b'c' * 100)
+
+    def test_writers_use_cache(self):
+        """Check that packs written through a cache are unchanged."""
+
+        cache = pack.ObjectCache()
+        plain = io.BytesIO()
+        self._write_blobs(pack.PackWriter(plain))
+        for _ in range(2):
+            cached = io.BytesIO()
+            self._write_blobs(pack.PackWriter(cached, cache=cache))
+            self.assertEqual(cached.getvalue(), plain.getvalue())
+
+            store = pack.MemoryObjectStore(cache=cache)
+            self._write_blobs(store)
+            f = io.BytesIO()
+            store.write_pack(f)
+            self.assertEqual(f.getvalue(), plain.getvalue())
+        self.assertEqual((cache.misses, cache.hits), (3, 9))
+
+    @staticmethod
+    def _write_blobs(writer):
+        for n in range(3):
+            writer.add(pack.OBJ_BLOB, str(n).encode())
+        if isinstance(writer, pack.PackWriter):
+            writer.close()
+
+
+class TestCommitFactory(unittest.TestCase):
+    """Tests for the CommitFactory class."""
+
+    def test_matches_serialize_commit(self):
+        """Check that commits equal the generically serialized ones."""
+
+        tree = pack.hash_object(pack.OBJ_TREE, b'')
+        author = b'A U Thor <author@example.com>'
+        factory = pack.CommitFactory(tree, author, b'msg\n')
+
+        parent = None
+        for timestamp in [0, 999999999, 1525521600, 1525521601]:
+            sha, data = factory.commit(parent, timestamp)
+            expected = pack.serialize_commit(
+                tree, [parent] if parent else [], author, timestamp,
+                b'msg\n'
+            )
+            self.assertEqual(data, expected)
+            self.assertEqual(sha, pack.hash_object(pack.OBJ_COMMIT, expected))
+            parent = sha
+
+
+if __name__ == '__main__':
+    unittest.main()
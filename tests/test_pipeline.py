@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.pipeline and Graph.fetch_async().
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.error import HTTPError
+
+import dulwich.repo
+
+from pointilist import aio, graph, pack, pipeline
+
+from fixture_server import FixtureServer, USERS
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestResponse(unittest.TestCase):
+    """Tests reading response bodies with pointilist.aio.Response."""
+
+    def _read(self, headers, data):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(data)
+            reader.feed_eof()
+            response = aio.Response(
+                'http://x/', 200, 'OK', headers, reader, mock.Mock()
+            )
+            return await response.read_all()
+        return _run(read())
+
+    def test_chunked(self):
+        self.assertEqual(self._read(
+            {'transfer-encoding': 'chunked'},
+            b'5\r\nhello\r\n7;x=y\r\n, world\r\n0\r\nA: b\r\n\r\n'
+        ), b'hello, world')
+
+    def test_content_length(self):
+        self.assertEqual(
+            self._read({'content-length': '5'}, b'helloEXTRA'), b'hello'
+        )
+        with self.assertRaises(ConnectionError):
+            self._read({'content-length': '8'}, b'hello')
+
+
+class TestFetchAsync(unittest.TestCase):
+    """Tests for the Graph.fetch_async() method."""
+
+    def setUp(self):
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def test_fetch_async(self):
+        g1 = graph.Graph('200')
+        _run(g1.fetch_async(self.server.base_url))
+        g2 = graph.Graph('200')
+        g2.fetch(self.server.base_url)
+
+        self.assertEqual(len(g1.data['rects']), 369)
+        self.assertEqual(g1.fingerprint, g2.fingerprint)
+
+    def test_fetch_async_errors(self):
+        with self.assertRaises(HTTPError) as cm:
+            _run(graph.Graph('404').fetch_async(self.server.base_url))
+        self.assertEqual(cm.exception.code, 404)
+
+        with self.assertRaises(ValueError):
+            _run(graph.Graph('garbage').fetch_async(self.server.base_url))
+
+
+class TestPipeline(unittest.TestCase):
+    """Tests for the run_pipeline() function."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.server = FixtureServer()
+        self.server.__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        self.dir.cleanup()
+
+    def test_run_pipeline(self):
+        snapshot = graph.Graph('snapshot')
+        with open(USERS['200'], 'r') as f:
+            snapshot._parse_graph_data(f.read())
+        output = os.path.join(self.dir.name, 'output')
+
+        reports = {
+            report['username']: report
+            for report in pipeline.run_pipeline(
+                ['200', '404', 'short', snapshot], seed=1,
+                output_dir=output, base_url=self.server.base_url,
+                fetchers=2, workers=2
+            )
+        }
+
+        self.assertEqual(
+            sorted(reports), ['200', '404', 'short', 'snapshot']
+        )
+        for name in ['200', 'snapshot']:
+            self.assertIsNone(reports[name]['error'])
+            path = os.path.join(output, name + '.git')
+            with dulwich.repo.Repo(path) as d:
+                self.assertEqual(d.head().decode(), reports[name]['head'])
+                self.assertEqual(
+                    len(list(d.get_walker())), reports[name]['commits']
+                )
+        self.assertTrue(reports['404']['error'].startswith('HTTPError'))
+        self.assertEqual(
+            reports['short']['error'],
+            'ValueError: Too few data points in graph: 14 < 365'
+        )
+
+    def test_run_pipeline_processes(self):
+        """Check that worker processes keep their scratch and cache."""
+
+        scratch = os.path.join(self.dir.name, 'scratch')
+        objects = os.path.join(self.dir.name, 'objects')
+        os.mkdir(scratch)
+        object_cache = pack.ObjectCache(max_size=0, directory=objects)
+
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            reports = pipeline.run_pipeline(
+                ['200', '200'], seed=1, base_url=self.server.base_url,
+                workers=2, executor=executor, tempdir=scratch,
+                object_cache=object_cache
+            )
+
+        self.assertTrue(all(r['error'] is None for r in reports))
+        self.assertEqual(reports[0]['head'], reports[1]['head'])
+        self.assertEqual(
+            sum(len(files) for _, _, files in os.walk(objects)), 2
+        )
+        self.assertEqual(os.listdir(scratch), [])
+
+    def test_overlap_and_backpressure(self):
+        """Check that fetching goes on during work, but not too far."""
+
+        lock = threading.Lock()
+        seen = []
+
+        def slow_job(job, *args):
+            with lock:
+                seen.append(len(self.server.requests))
+            time.sleep(0.2)
+            return {'username': job.username, 'error': None}
+
+        with mock.patch.object(pipeline, 'run_job', side_effect=slow_job):
+            reports = pipeline.run_pipeline(
+                ['200'] * 6, base_url=self.server.base_url,
+                fetchers=1, workers=1, max_pending=1
+            )
+
+        self.assertEqual(len(reports), 6)
+        # while the first job is worked on, the next graph is fetched
+        # and queued, and one more fetched graph waits for the queue
+        self.assertLessEqual(seen[0], 3)
+        self.assertGreaterEqual(seen[1], 3)
+        self.assertLessEqual(seen[1], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
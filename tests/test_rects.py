@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.rects.
+"""
+
+import unittest
+
+from pointilist import rects
+
+RECTS_VALID = [
+    {'count': 3, 'date': '2017-05-28', 'x': 13, 'y': 0, 'fill': '#239a3b'},
+    {'count': 0, 'date': '2017-05-29', 'x': 13, 'y': 12, 'fill': '#ebedf0'},
+    {'count': 3, 'date': '2017-05-30', 'x': 13, 'y': 24, 'fill': '#239a3b'}
+]
+
+
+class TestRectArray(unittest.TestCase):
+    """Tests for the RectArray columnar storage."""
+
+    def test_dict_view(self):
+        """Check that the dict view matches the input data."""
+
+        r = rects.RectArray.from_dicts(RECTS_VALID)
+
+        self.assertEqual(len(r), 3)
+        self.assertEqual(r, RECTS_VALID)
+        self.assertEqual(r[-1], RECTS_VALID[-1])
+        self.assertEqual(r[1:], RECTS_VALID[1:])
+        with self.assertRaises(IndexError):
+            r[3]
+
+    def test_columns(self):
+        """Check that dates are ordinals and fills are interned."""
+
+        r = rects.RectArray.from_dicts(RECTS_VALID)
+
+        self.assertEqual(list(r.counts), [3, 0, 3])
+        self.assertEqual(r.dates[1] - r.dates[0], 1)
+        self.assertEqual(r.date(0), '2017-05-28')
+        self.assertEqual(r.palette, ['#239a3b', '#ebedf0'])
+        self.assertEqual(list(r.fills), [0, 1, 0])
+
+    def test_inequality(self):
+        """Check comparison against differing data."""
+
+        r = rects.RectArray.from_dicts(RECTS_VALID)
+
+        self.assertNotEqual(r, RECTS_VALID[:2])
+        self.assertNotEqual(r, rects.RectArray.from_dicts(RECTS_VALID[1:]))
+        self.assertEqual(r, rects.RectArray.from_dicts(RECTS_VALID))
+
+
+class TestCommitArray(unittest.TestCase):
+    """Tests for the CommitArray columnar storage."""
+
+    def test_dict_view(self):
+        commits = [
+            {'date': '2018-05-04', 'count': 0},
+            {'date': '2018-05-05', 'count': 3}
+        ]
+        c = rects.CommitArray.from_dicts(commits)
+
+        self.assertEqual(c, commits)
+        self.assertEqual(list(c.counts), [0, 3])
+        self.assertEqual(c.date(1), '2018-05-05')
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            rects.CommitArray([1, 2], [0])
+
+
+class TestColumnarSequence(unittest.TestCase):
+    """Tests for the _ColumnarSequence base class."""
+
+    def test_abstract(self):
+        class Rows(rects._ColumnarSequence):
+            def __len__(self):
+                return 0
+
+        with self.assertRaises(TypeError):
+            rects._ColumnarSequence()
+        with self.assertRaises(TypeError):
+            Rows()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,11 +8,17 @@
 
 import unittest
 
+import datetime
+import io
 import os
 import sys
+import tempfile
+import time
 from io import StringIO
 
-from pointilist import repo
+import dulwich.repo
+
+from pointilist import pack, repo
 
 COMMITS_ZERO_COUNT = [
     {
@@ -35,6 +41,17 @@ COMMITS_VALID = [
     }
 ]
 
+COMMITS_LATER = COMMITS_VALID + [
+    {
+        'date': '2018-05-06',
+        'count': 2
+    },
+    {
+        'date': '2018-05-07',
+        'count': 1
+    }
+]
+
 FAKE_STDERR = StringIO()
 
 
@@ -61,6 +78,12 @@ class TestConstructor(unittest.TestCase):
 
         self.assertFalse(os.path.exists(r.tempdir))
 
+    def test_repo_in_memory(self):
+        """Check that no working directory is created in memory mode."""
+
+        with repo.Repo([], in_memory=True) as r:
+            self.assertIsNone(r.tempdir)
+
 
 class TestPopulateMethod(unittest.TestCase):
     """Tests for the Repo.populate() method."""
@@ -95,3 +118,207 @@ class TestPopulateMethod(unittest.TestCase):
             -1,
             sys.stderr.getvalue().strip().find('Nothing to commit.')
         )
+
+    def test_populate_valid(self):
+        """Check that a single valid pack with all commits is written."""
+
+        with repo.Repo(COMMITS_VALID, tempdir=self.dir) as r:
+            r.populate()
+
+            pack_dir = os.path.join(r.tempdir, 'objects', 'pack')
+            self.assertEqual(
+                sorted(os.path.splitext(f)[1] for f in os.listdir(pack_dir)),
+                ['.idx', '.pack']
+            )
+
+            with dulwich.repo.Repo(r.tempdir) as d:
+                for p in d.object_store.packs:
+                    p.check()
+                self.assertEqual(d.head(), r.head.hex().encode())
+                history = [e.commit for e in d.get_walker()]
+
+            self.assertEqual(len(history), 3)
+            for commit in history:
+                self.assertEqual(
+                    time.strftime(
+                        '%Y-%m-%d', time.gmtime(commit.author_time)
+                    ),
+                    '2018-05-05'
+                )
+            self.assertEqual(len(set(c.tree for c in history)), 1)
+
+    def test_populate_in_memory(self):
+        """Check that memory and disk mode produce the same pack."""
+
+        with repo.Repo(COMMITS_VALID, in_memory=True) as r:
+            r.populate()
+            in_memory = io.BytesIO()
+            checksum = r.write_pack(in_memory)
+            self.assertIsNone(r.tempdir)
+
+        with repo.Repo(COMMITS_VALID, tempdir=self.dir) as r:
+            r.populate()
+            on_disk = io.BytesIO()
+            self.assertEqual(r.write_pack(on_disk), checksum)
+
+        self.assertEqual(in_memory.getvalue(), on_disk.getvalue())
+        self.assertEqual(in_memory.getvalue()[-20:], checksum)
+
+    def test_write_pack_empty(self):
+        """Check for ValueError if populate() was not called before."""
+
+        with repo.Repo(COMMITS_VALID, in_memory=True) as r:
+            with self.assertRaises(ValueError):
+                r.write_pack(io.BytesIO())
+
+    def test_populate_generator(self):
+        """Check that a lazily generated plan is consumed as a stream."""
+
+        start = datetime.date(2015, 1, 1).toordinal()
+        plan = ((start + i, i % 3) for i in range(3 * 365))
+
+        with repo.Repo(plan, in_memory=True) as r:
+            r.populate()
+            # blob, tree and one commit per planned contribution
+            self.assertEqual(len(r.objects), 2 + 365 * 3)
+
+    def test_populate_generator_out_of_order(self):
+        """Check for ValueError if a lazy plan is not sorted by date."""
+
+        plan = iter([('2018-05-05', 1), ('2018-05-04', 1)])
+        with repo.Repo(plan, in_memory=True) as r:
+            with self.assertRaises(ValueError):
+                r.populate()
+
+    def test_populate_generator_nothing_to_commit(self):
+        plan = (('2018-05-0{}'.format(i), 0) for i in range(1, 8))
+        with repo.Repo(plan, in_memory=True) as r:
+            r.populate()
+            self.assertIsNone(r.head)
+
+        self.assertNotEqual(
+            -1,
+            sys.stderr.getvalue().strip().find('Nothing to commit.')
+        )
+
+
+class TestIncrementalUpdate(unittest.TestCase):
+    """Tests for populating an existing repository."""
+
+    def setUp(self):
+        sys.stderr = FAKE_STDERR
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.path = os.path.join(self.dir.name, 'repo.git')
+
+    def tearDown(self):
+        sys.stderr = sys.__stderr__
+        self.dir.cleanup()
+
+    def test_append_new_days(self):
+        """Check that only days after the latest commit are added."""
+
+        with repo.Repo(COMMITS_VALID, path=self.path) as r:
+            r.populate()
+            self.assertIsNone(r.base)
+            self.assertEqual(r.written, 3)
+            first_head = r.head
+        self.assertTrue(os.path.isdir(self.path))
+
+        with repo.Repo(COMMITS_LATER, path=self.path) as r:
+            r.populate()
+            self.assertEqual(r.base, first_head)
+            self.assertEqual(r.written, 3)
+            new_pack = io.BytesIO()
+            r.write_pack(new_pack)
+
+        # the new pack only holds the three new commits
+        self.assertEqual(new_pack.getvalue()[8:12], b'\0\0\0\3')
+
+        with dulwich.repo.Repo(self.path) as d:
+            history = [e.commit for e in d.get_walker()]
+        self.assertEqual(len(history), 6)
+        self.assertEqual(history[3].id, first_head.hex().encode())
+        self.assertEqual(
+            time.strftime('%Y-%m-%d', time.gmtime(history[0].author_time)),
+            '2018-05-07'
+        )
+
+    def test_nothing_new(self):
+        """Check that an up to date repository is left alone."""
+
+        with repo.Repo(COMMITS_VALID, path=self.path) as r:
+            r.populate()
+            head = r.head
+
+        with repo.Repo(COMMITS_VALID, path=self.path) as r:
+            r.populate()
+            self.assertEqual(r.head, head)
+            self.assertEqual(r.written, 0)
+
+        self.assertNotEqual(
+            -1,
+            sys.stderr.getvalue().strip().find('Nothing to commit.')
+        )
+
+    def test_failed_populate_leaves_no_garbage(self):
+        """Check that no temporary pack remains if writing fails."""
+
+        plan = iter([('2018-05-05', 1), ('2018-05-04', 1)])
+        with repo.Repo(plan, path=self.path) as r:
+            with self.assertRaises(ValueError):
+                r.populate()
+
+        self.assertEqual(
+            os.listdir(os.path.join(self.path, 'objects', 'pack')), []
+        )
+
+    def test_in_memory_update(self):
+        """Check that an in-memory update holds just the new commits."""
+
+        with repo.Repo(COMMITS_VALID, path=self.path) as r:
+            r.populate()
+
+        with repo.Repo(COMMITS_LATER, path=self.path, in_memory=True) as r:
+            r.populate()
+            self.assertEqual(len(r.objects), 3)
+
+
+class TestObjectCache(unittest.TestCase):
+    """Tests for repositories sharing a pack.ObjectCache."""
+
+    def setUp(self):
+        self.dir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            self.dir = os.environ['POINTILIST_TEST_BASEDIR']
+
+    def test_shared_cache(self):
+        """Check that identical objects are compressed only once."""
+
+        with repo.Repo(COMMITS_LATER, in_memory=True) as r:
+            r.populate()
+            expected = io.BytesIO()
+            r.write_pack(expected)
+
+        cache = pack.ObjectCache()
+        with repo.Repo(COMMITS_LATER, in_memory=True,
+                       object_cache=cache) as r:
+            r.populate()
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        with repo.Repo(COMMITS_LATER, tempdir=self.dir,
+                       object_cache=cache) as r:
+            r.populate()
+            f = io.BytesIO()
+            r.write_pack(f)
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertEqual(f.getvalue(), expected.getvalue())
+
+        # other authors share the blob and tree but not the template
+        with repo.Repo(COMMITS_LATER, in_memory=True, object_cache=cache,
+                       author='other <other@example.com>') as r:
+            r.populate()
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+        self.assertEqual(len(cache._factories), 2)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.schedule.
+"""
+
+import email.utils
+import os
+import tempfile
+import time
+import unittest
+from urllib.error import HTTPError
+
+from pointilist.cache import GraphCache
+from pointilist.schedule import FetchScheduler, TokenBucket, retry_after
+
+from fixture_server import USERS, FixtureServer
+
+
+class ThrottlingServer(FixtureServer):
+    """Answers the first requests for each user with errors.
+
+    failures maps usernames to lists of (status, headers) responses
+    sent before the fixture; delay holds up every response.
+    """
+
+    def __init__(self, failures=None, delay=0, users=None):
+        super().__init__(users)
+        self.failures = failures or {}
+        self.delay = delay
+        self.times = []
+
+    def respond(self, path, headers):
+        with self.lock:
+            self.times.append(time.monotonic())
+            username = path.split('/')[2] if path.count('/') >= 2 else ''
+            failures = self.failures.get(username)
+            failure = failures.pop(0) if failures else None
+        if self.delay:
+            time.sleep(self.delay)
+        if failure is not None:
+            status, failure_headers = failure
+            return status, failure_headers, b'Slow down'
+        return super().respond(path, headers)
+
+
+class _FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Tests for the TokenBucket class."""
+
+    def test_reserve(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(2, burst=2, clock=clock)
+
+        self.assertEqual([bucket.reserve() for _ in range(4)],
+                         [0, 0, 0.5, 1.0])
+        clock.now += 2
+        # the two queued requests used up half the refill
+        self.assertEqual([bucket.reserve() for _ in range(3)],
+                         [0, 0, 0.5])
+
+    def test_pause(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(10, burst=5, clock=clock)
+        bucket.pause(3)
+        bucket.pause(1)
+        self.assertEqual(bucket.reserve(), 3)
+        clock.now += 3
+        self.assertEqual(bucket.reserve(), 0)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+        with self.assertRaises(ValueError):
+            TokenBucket(1, burst=0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    """Tests for the retry_after() function."""
+
+    def test_retry_after(self):
+        self.assertEqual(retry_after('120'), 120)
+        self.assertIsNone(retry_after(None))
+        self.assertIsNone(retry_after('soon'))
+        now = time.time()
+        date = email.utils.formatdate(now + 30, usegmt=True)
+        self.assertAlmostEqual(retry_after(date, now), 30, delta=1)
+        date = email.utils.formatdate(now - 30, usegmt=True)
+        self.assertEqual(retry_after(date, now), 0)
+
+
+class TestFetchScheduler(unittest.TestCase):
+    """Tests for the FetchScheduler class."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.sleeps = []
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _scheduler(self, server, **kwargs):
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            time.sleep(seconds)
+
+        kwargs.setdefault('rate', 1000)
+        kwargs.setdefault('backoff', 0.01)
+        return FetchScheduler(
+            base_url=server.base_url, sleep=sleep, **kwargs
+        )
+
+    def test_retry(self):
+        """Check that throttled and failed requests are retried."""
+
+        failures = {
+            '200': [(429, {'Retry-After': '0'}), (503, {})],
+            'short': [(500, {})]
+        }
+        with ThrottlingServer(failures) as server:
+            scheduler = self._scheduler(server)
+            for username in ['200', 'short', 'garbage']:
+                scheduler.submit(username)
+            with self.assertLogs(level='INFO') as cm:
+                results = {
+                    graph.username: (graph, error)
+                    for graph, error in scheduler.run()
+                }
+
+        self.assertEqual(len(server.requests), 6)
+        self.assertEqual(len(cm.output), 3)
+        self.assertIsNone(results['200'][1])
+        self.assertEqual(len(results['200'][0].data['rects']), 369)
+        self.assertIn('Too few data points', str(results['short'][1]))
+        self.assertIn('Expected svg', str(results['garbage'][1]))
+        self.assertEqual(len(scheduler), 0)
+
+    def test_give_up(self):
+        """Check that errors are reported once retries are exhausted."""
+
+        failures = {
+            '200': [(429, {})] * 3,
+            'short': [(403, {})]
+        }
+        with ThrottlingServer(failures) as server:
+            scheduler = self._scheduler(server, retries=2)
+            scheduler.submit('200')
+            scheduler.submit('short')
+            with self.assertLogs(level='INFO'):
+                results = {
+                    graph.username: error
+                    for graph, error in scheduler.run()
+                }
+
+        self.assertIsInstance(results['200'], HTTPError)
+        self.assertEqual(results['200'].code, 429)
+        self.assertEqual(results['short'].code, 403)
+        self.assertEqual(len(server.requests), 4)
+        # backoff without Retry-After is capped at backoff * 2 ** attempt
+        self.assertTrue(all(s <= 0.02 for s in self.sleeps))
+
+    def test_retry_after_pauses_host(self):
+        """Check that a 429 with Retry-After holds back other requests."""
+
+        failures = {'200': [(429, {'Retry-After': '1'})]}
+        with ThrottlingServer(failures, users={
+                '200': USERS['200'], 'other': USERS['200']}) as server:
+            # the clock stands still, so the pause never ends
+            scheduler = FetchScheduler(
+                base_url=server.base_url, concurrency=1,
+                sleep=self.sleeps.append, clock=_FakeClock()
+            )
+            scheduler.submit('200')
+            scheduler.submit('other')
+            with self.assertLogs(level='INFO'):
+                for _, error in scheduler.run():
+                    self.assertIsNone(error)
+
+        self.assertEqual(len(server.requests), 3)
+        # the retry delay, then the pause before each later request
+        self.assertEqual(self.sleeps, [1.0, 1.0, 1.0])
+
+    def test_rate_limit(self):
+        """Check that requests are spaced out by the token bucket."""
+
+        with ThrottlingServer() as server:
+            scheduler = self._scheduler(server, rate=20, burst=1)
+            for _ in range(5):
+                scheduler.submit('200')
+            for _, error in scheduler.run():
+                self.assertIsNone(error)
+
+        self.assertGreaterEqual(server.times[-1] - server.times[0], 0.18)
+
+    def test_timeout(self):
+        """Check that slow responses time out and are retried."""
+
+        with ThrottlingServer(delay=0.3) as server:
+            scheduler = self._scheduler(server, timeout=0.05, retries=1)
+            scheduler.submit('200')
+            with self.assertLogs(level='INFO'):
+                (graph, error), = scheduler.run()
+
+        self.assertEqual(graph.username, '200')
+        self.assertIsNotNone(error)
+        self.assertNotIsInstance(error, HTTPError)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_stale_first(self):
+        """Check that graphs fetched longest ago are refreshed first."""
+
+        users = {name: USERS['200'] for name in 'abcd'}
+        cache = GraphCache(self.dir.name, ttl=600)
+        now = time.time()
+        for name, fetched in [('a', now - 3600), ('b', now - 60),
+                              ('c', now - 7200)]:
+            cache.put(name, b'', {}, {'rects': []}, fetched=fetched)
+
+        with ThrottlingServer(users=users) as server:
+            scheduler = self._scheduler(
+                server, cache=cache, concurrency=1
+            )
+            for name in 'abcd':
+                scheduler.submit(name)
+            order = [graph.username for graph, _ in scheduler.run()]
+
+        self.assertEqual(order, ['d', 'c', 'a', 'b'])
+        # b is fresh and needs no request
+        self.assertEqual(
+            [path.split('/')[2] for path, _ in server.requests],
+            ['d', 'c', 'a']
+        )
+
+    def test_fresh_takes_no_token(self):
+        """Check that fresh graphs need no token, whatever the priority."""
+
+        cache = GraphCache(self.dir.name, ttl=600)
+        for name in 'ab':
+            cache.put(name, b'', {}, {'rects': []})
+
+        with ThrottlingServer() as server:
+            scheduler = FetchScheduler(
+                base_url=server.base_url, rate=0.001, burst=1, cache=cache,
+                sleep=self.sleeps.append
+            )
+            scheduler.submit('a', priority=2)
+            scheduler.submit('b', priority=1)
+            for _, error in scheduler.run():
+                self.assertIsNone(error)
+
+        self.assertEqual(server.requests, [])
+        self.assertEqual(self.sleeps, [])
+
+    def test_expired_after_submit(self):
+        """Check that entries expiring before their turn are refreshed."""
+
+        cache = GraphCache(self.dir.name, ttl=600)
+        cache.put('200', b'', {}, {'rects': []})
+
+        with ThrottlingServer(delay=0.3) as server:
+            scheduler = self._scheduler(
+                server, cache=cache, timeout=0.05, retries=0
+            )
+            scheduler.submit('200')
+            cache.put('200', b'', {}, {'rects': []},
+                      fetched=time.time() - 3600)
+            (_, error), = scheduler.run()
+
+        # the request is made, and with the timeout of the scheduler
+        self.assertEqual(len(server.requests), 1)
+        self.assertIsNotNone(error)
+        self.assertNotIsInstance(error, HTTPError)
+
+
+if __name__ == '__main__':
+    unittest.main()
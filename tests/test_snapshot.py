@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.snapshot and Graph.save()/Graph.load().
+"""
+
+import gc
+import os
+import pickle
+import tempfile
+import unittest
+from array import array
+
+from pointilist import graph, snapshot
+
+STATIC_DIR = os.path.dirname(os.path.realpath(__file__)) \
+        + '/static/'
+CONTRIB_HTML = STATIC_DIR + 'contributions.html'
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests saving and loading graph snapshots."""
+
+    def setUp(self):
+        basedir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            basedir = os.environ['POINTILIST_TEST_BASEDIR']
+        self.dir = tempfile.TemporaryDirectory(dir=basedir)
+        self.path = os.path.join(self.dir.name, 'user.snapshot')
+
+        self.graph = graph.Graph('user')
+        with open(CONTRIB_HTML, 'r') as f:
+            self.graph._parse_graph_data(f.read())
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_round_trip(self):
+        self.graph.save(self.path)
+        loaded = graph.Graph.load(self.path)
+
+        self.assertEqual(loaded.username, 'user')
+        self.assertEqual(loaded.data['rects'], self.graph.data['rects'])
+        self.assertEqual(
+            list(loaded.data['rects']), list(self.graph.data['rects'])
+        )
+        for key in ['months', 'wdays', 'colormap']:
+            self.assertEqual(loaded.data[key], self.graph.data[key])
+        self.assertEqual(loaded.fill(seed=3), self.graph.fill(seed=3))
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs procfs')
+    def test_no_open_files(self):
+        """Check that loaded graphs keep no file descriptors open."""
+
+        self.graph.save(self.path)
+        # close what earlier tests left to the garbage collector
+        gc.collect()
+        before = len(os.listdir('/proc/self/fd'))
+        graphs = [graph.Graph.load(self.path) for _ in range(50)]
+
+        self.assertEqual(len(os.listdir('/proc/self/fd')), before)
+        self.assertIsInstance(graphs[0].data['rects'].counts, array)
+
+    def test_pickle(self):
+        """Check that loaded graphs can be sent to other processes."""
+
+        self.graph.save(self.path)
+        loaded = graph.Graph.load(self.path)
+        copy = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(copy.data['rects'], self.graph.data['rects'])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            graph.Graph('user').save(self.path)
+
+        self.graph.save(self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        for corrupt, message in [
+                (b'XXXX' + data[4:], 'Not a graph snapshot'),
+                (data[:4] + b'\x63\0' + data[6:], 'Unsupported'),
+                (data[:-1], 'Truncated'),
+                (data[:10], 'Truncated')]:
+            with open(self.path, 'wb') as f:
+                f.write(corrupt)
+            with self.assertRaises(ValueError) as cm:
+                snapshot.load(self.path)
+            self.assertIn(message, str(cm.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
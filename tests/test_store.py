@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier:     MIT
+
+"""
+    Unit tests for pointilist.store.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+import zlib
+
+from pointilist import pack, repo, store
+
+COMMITS_VALID = [
+    {
+        'date': '2018-05-04',
+        'count': 2
+    },
+    {
+        'date': '2018-05-05',
+        'count': 3
+    }
+]
+
+
+class TestApplyDelta(unittest.TestCase):
+    """Tests for the apply_delta() function."""
+
+    def test_copy_and_insert(self):
+        base = b'hello world'
+        # sizes 11 -> 12, copy 6 bytes from offset 0, insert 'there!'
+        delta = bytes([11, 12, 0x91, 0, 6, 6]) + b'there!'
+
+        self.assertEqual(store.apply_delta(base, delta), b'hello there!')
+
+    def test_size_mismatch(self):
+        with self.assertRaises(ValueError):
+            store.apply_delta(b'abc', bytes([4, 1, 1]) + b'x')
+
+
+class TestDiskObjectStore(unittest.TestCase):
+    """Tests for the DiskObjectStore class."""
+
+    def setUp(self):
+        self.dir = None
+        if 'POINTILIST_TEST_BASEDIR' in os.environ:
+            self.dir = os.environ['POINTILIST_TEST_BASEDIR']
+
+    def test_read_packed(self):
+        with repo.Repo(COMMITS_VALID, tempdir=self.dir) as r:
+            r.populate()
+            s = store.DiskObjectStore(r.tempdir)
+
+            self.assertEqual(s.ref('refs/heads/master'), r.head)
+            self.assertIsNone(s.ref('refs/heads/missing'))
+            self.assertTrue(s.contains(r.head))
+            self.assertFalse(s.contains(b'\0' * 20))
+
+            obj_type, data = s.read(r.head)
+            self.assertEqual(obj_type, pack.OBJ_COMMIT)
+            self.assertEqual(pack.hash_object(obj_type, data), r.head)
+            with self.assertRaises(KeyError):
+                s.read(b'\0' * 20)
+
+    def test_read_loose(self):
+        with tempfile.TemporaryDirectory(dir=self.dir) as path:
+            sha = pack.hash_object(pack.OBJ_BLOB, b'hello\n')
+            name = sha.hex()
+            os.makedirs(os.path.join(path, 'objects', name[:2]))
+            with open(
+                os.path.join(path, 'objects', name[:2], name[2:]), 'wb'
+            ) as f:
+                f.write(zlib.compress(b'blob 6\0hello\n'))
+
+            s = store.DiskObjectStore(path)
+            self.assertTrue(s.contains(sha))
+            self.assertEqual(s.read(sha), (pack.OBJ_BLOB, b'hello\n'))
+
+    @unittest.skipUnless(shutil.which('git'), 'git not installed')
+    def test_read_deltified(self):
+        """Check reading a pack repacked with deltas by git."""
+
+        with repo.Repo(COMMITS_VALID, tempdir=self.dir) as r:
+            r.populate()
+            subprocess.check_call(
+                ['git', '--git-dir', r.tempdir, 'repack', '-a', '-d', '-f',
+                 '-q', '--window=50', '--depth=50']
+            )
+
+            s = store.DiskObjectStore(r.tempdir)
+            sha = r.head
+            for _ in range(5):
+                obj_type, data = s.read(sha)
+                self.assertEqual(pack.hash_object(obj_type, data), sha)
+                parents = [
+                    line[7:] for line in data.split(b'\n')
+                    if line.startswith(b'parent ')
+                ]
+                if not parents:
+                    break
+                sha = bytes.fromhex(parents[0].decode())
+
+
+if __name__ == '__main__':
+    unittest.main()